@@ -0,0 +1,263 @@
+"""
+Concurrent load test of the views: one ASGI worker (uvicorn mode) against one
+gunicorn-style sync worker.
+
+Each setup runs in its own process against artifacts built from a synthetic
+catalogue, and the app is called directly, without sockets:
+
+    wsgi       the sync views, one request at a time, like gunicorn's default
+               sync worker class
+    asgi_sync  the sync views under ASGI, --concurrency requests in flight
+    asgi       the async views (ASYNC_VIEWS=1, as asgi.py sets it) under ASGI,
+               --concurrency requests in flight on one event loop, like a
+               single uvicorn worker
+
+The numbers are the per-worker ceiling of the Django stack, not of a whole server.
+
+SQLite answers in microseconds, which hides what overlapping DB waits is
+worth; --db-latency-ms adds a sleep to every SQL query to stand in for a
+database on another host.
+
+    python benchmarks/load_test.py --movies 10000 --concurrency 32 --db-latency-ms 2
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+import numpy as np
+
+from run_benchmarks import latency_summary, run_build
+from synthetic import write_catalog
+
+SETUPS = ['wsgi', 'asgi_sync', 'asgi']
+
+
+def request_mix(metadata, n, seed):
+    """(path, query string) pairs: 60% detail pages, 30% title searches, 10% the index."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(metadata), n)
+    requests = []
+    for i, row in enumerate(rows):
+        if i % 10 < 6:
+            requests.append((f'/movie/{int(metadata.movie_id[row])}/', ''))
+        elif i % 10 < 9:
+            title = metadata.title[row]
+            requests.append(('/search/', urlencode({'q': title[:max(3, len(title) // 2)], 'type': 'title'})))
+        else:
+            requests.append(('/', ''))
+    return requests
+
+
+def run_wsgi(app, requests):
+    """Requests one after another, as a gunicorn sync worker serves them."""
+    latencies = []
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    start = time.perf_counter()
+    for path, query in requests:
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'REQUEST_METHOD': 'GET',
+                   'wsgi.input': io.BytesIO(), 'REMOTE_ADDR': '127.0.0.1'}
+        setup_testing_defaults(environ)
+        t = time.perf_counter()
+        response = app(environ, start_response)
+        b''.join(response)
+        response.close()
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latencies, statuses
+
+
+async def asgi_request(app, path, query):
+    done = asyncio.Event()
+    status = []
+    sent_body = []
+
+    async def receive():
+        if not sent_body:
+            sent_body.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the response is complete
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    await app(scope, receive, send)
+    return status[0] if status else 0
+
+
+async def run_asgi(app, requests, concurrency):
+    """Up to `concurrency` requests in flight on one event loop, as one uvicorn worker serves them."""
+    latencies = []
+    statuses = []
+    pending = iter(requests)
+
+    async def client():
+        for path, query in pending:
+            t = time.perf_counter()
+            statuses.append(await asgi_request(app, path, query))
+            latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def add_db_latency(seconds):
+    """Sleep before every SQL query, on every connection (the ASGI requests each open their own)."""
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    def slow_query(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if slow_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow_query)
+
+    connection_created.connect(install, weak=False)
+    install(connection)
+
+
+def summary(seconds, latencies, statuses):
+    result = latency_summary(latencies)
+    result['seconds'] = seconds
+    # Requests completed per second of wall time, with every request in flight counted
+    result['throughput_per_s'] = len(latencies) / seconds
+    result['errors'] = sum(1 for s in statuses if s >= 500)
+    return result
+
+
+def serve(args):
+    """Run one setup (args.serve) against args.artifacts_dir and write its results to args.results."""
+    os.environ['ARTIFACTS_DIR'] = args.artifacts_dir
+    os.environ['ASYNC_VIEWS'] = '1' if args.serve == 'asgi' else '0'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie_recommender.settings')
+    import django
+    django.setup()
+    # WhiteNoise warns about a missing STATIC_ROOT (no collectstatic here)
+    warnings.filterwarnings('ignore', message='No directory at')
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+    from core import artifacts
+    from core.models import Movie
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.DEBUG = False
+    old_db_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        bundle = artifacts.reload_artifacts()
+        metadata = bundle.metadata
+        Movie.objects.bulk_create(
+            [Movie(tmdb_id=int(metadata.movie_id[row]), title=metadata.title[row],
+                   popularity=float(metadata.popularity[row]), vote_average=float(metadata.vote_average[row]))
+             for row in range(len(metadata))],
+            batch_size=2000, ignore_conflicts=True,
+        )
+        requests = request_mix(metadata, args.requests, args.seed)
+        if args.db_latency_ms:
+            add_db_latency(args.db_latency_ms / 1000)
+
+        warmup = requests[:min(50, len(requests))]
+        if args.serve == 'wsgi':
+            app = get_wsgi_application()
+            run_wsgi(app, warmup)
+            result = summary(*run_wsgi(app, requests))
+        else:
+            app = get_asgi_application()
+            asyncio.run(run_asgi(app, warmup, args.concurrency))
+            result = summary(*asyncio.run(run_asgi(app, requests, args.concurrency)))
+    finally:
+        connection.creation.destroy_test_db(old_db_name, verbosity=0)
+    with open(args.results, 'w') as f:
+        json.dump(result, f)
+
+
+def run_load(artifacts_dir, args):
+    """Results per setup, each measured in a fresh process."""
+    results = {}
+    for setup in SETUPS:
+        results_file = os.path.join(os.path.dirname(artifacts_dir), f'{setup}.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--serve', setup, '--artifacts-dir', artifacts_dir,
+                        '--results', results_file, '--requests', str(args.requests), '--seed', str(args.seed),
+                        '--concurrency', str(args.concurrency), '--db-latency-ms', str(args.db_latency_ms)],
+                       check=True, stdout=subprocess.DEVNULL)
+        with open(results_file) as f:
+            results[setup] = r = json.load(f)
+        print(f"  {setup:<10} {r['throughput_per_s']:8.0f} req/s   p50 {r['p50_s'] * 1000:8.2f} ms   "
+              f"p99 {r['p99_s'] * 1000:8.2f} ms   errors {r['errors']}")
+    print(f"  asgi / wsgi throughput: {results['asgi']['throughput_per_s'] / results['wsgi']['throughput_per_s']:.2f}x")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare per-worker throughput of the ASGI and sync setups.')
+    parser.add_argument('--movies', type=int, default=10000, help='Synthetic catalogue size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='Reuse an existing catalogue instead of generating one')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per setup')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight on the ASGI worker')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='Simulated round-trip per SQL query')
+    parser.add_argument('--output', help='Write results JSON here')
+    # Internal: measure one setup in this process
+    parser.add_argument('--serve', choices=SETUPS, help=argparse.SUPPRESS)
+    parser.add_argument('--artifacts-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--results', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return 0
+
+    work_dir = tempfile.mkdtemp(prefix='recsys-load-')
+    try:
+        data_dir = args.data_dir
+        if not data_dir:
+            data_dir = os.path.join(work_dir, 'data')
+            print(f"Generating {args.movies} synthetic movies...")
+            write_catalog(data_dir, args.movies, args.seed)
+        output_dir = os.path.join(work_dir, 'artifacts')
+        os.makedirs(output_dir)
+        print("Building artifacts:")
+        run_build(data_dir, output_dir, args.movies, verbose=False)
+        print(f"Load test ({args.requests} requests, concurrency {args.concurrency}, "
+              f"DB latency {args.db_latency_ms:g} ms):")
+        results = run_load(output_dir, args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results['meta'] = {key: getattr(args, key) for key in ('movies', 'seed', 'requests', 'concurrency', 'db_latency_ms')}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+End-to-end benchmark of the model build and the serving path.
+
+Generates a synthetic TMDB-shaped catalogue, times every generate_models.py
+stage, then loads the artifacts into the Django app and times
+get_recommendations, search_movies and the views through the test client.
+Results (seconds, throughput, latency percentiles, per-stage peak RSS) are written as
+JSON; pass --baseline to compare against an earlier run and exit non-zero
+on regressions.
+
+    python benchmarks/run_benchmarks.py --movies 10000 --output bench.json
+    python benchmarks/run_benchmarks.py --movies 10000 --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT, 'movie_recommender')
+sys.path[:0] = [ROOT, PROJECT_DIR]
+
+import generate_models  # noqa: E402
+from synthetic import write_catalog  # noqa: E402
+
+# Differences below these floors are noise, never regressions
+SECONDS_FLOOR = 0.005
+LATENCY_FLOOR = 50e-6
+RSS_FLOOR_MB = 16
+
+
+def cumulative_peak_rss_mb():
+    """High-water mark of the whole process so far (never goes down between stages)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """Resident set size right now, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class RssSampler:
+    """
+    Peak RSS while the block runs, sampled every `interval` seconds by a
+    background thread. Unlike ru_maxrss this belongs to the block alone: a
+    stage that stays below an earlier stage's peak reports its own peak.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+def latency_summary(samples):
+    samples = np.asarray(samples)
+    return {
+        'calls': int(len(samples)),
+        'throughput_per_s': float(len(samples) / samples.sum()) if samples.sum() else None,
+        'mean_s': float(samples.mean()),
+        'p50_s': float(np.percentile(samples, 50)),
+        'p90_s': float(np.percentile(samples, 90)),
+        'p99_s': float(np.percentile(samples, 99)),
+        'max_s': float(samples.max()),
+    }
+
+
+class StageTimer:
+    def __init__(self, n_movies, verbose):
+        self.n_movies = n_movies
+        self.verbose = verbose
+        self.results = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # generate_models.py is chatty; keep its progress output out of the report
+        quiet = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with quiet, RssSampler() as rss:
+            yield
+        seconds = time.perf_counter() - start
+        self.results[name] = {
+            'seconds': seconds,
+            'movies_per_s': self.n_movies / seconds if seconds else None,
+            'stage_peak_rss_mb': rss.peak_mb,
+            'cumulative_peak_rss_mb': cumulative_peak_rss_mb(),
+        }
+        stage_peak = f"{rss.peak_mb:8.1f} MB" if rss.peak_mb is not None else '       n/a'
+        print(f"  {name:<12} {seconds:9.3f} s   peak RSS {stage_peak}")
+
+
+def run_build(data_dir, output_dir, n_movies, verbose, weighting='tfidf', embedding_dims=0):
+    """Time each generate_models.py stage. Returns (results, new_df)."""
+    timer = StageTimer(n_movies, verbose)
+    with timer.stage('load'):
+        movies = generate_models.load_data(data_dir)
+    with timer.stage('preprocess'):
+        new_df = generate_models.preprocess_data(movies)
+        del movies
+    with timer.stage('metadata'):
+        metadata = generate_models.build_metadata(new_df)
+    with timer.stage('stem'):
+        generate_models.stem_tags(new_df)
+    with timer.stage('vectorize'):
+        vectors = generate_models.vectorize(new_df, weighting)
+    embeddings = None
+    if embedding_dims:
+        with timer.stage('embed'):
+            embeddings = generate_models.compute_embeddings(vectors, embedding_dims)
+        with timer.stage('similarity'):
+            similarity = generate_models.compute_dense_similarity(embeddings)
+        signatures = embeddings.astype(np.float16)
+    else:
+        with timer.stage('similarity'):
+            similarity = generate_models.compute_similarity(vectors)
+        with timer.stage('signatures'):
+            signatures = generate_models.compute_signatures(vectors)
+    with timer.stage('save'):
+        generate_models.save_artifacts(new_df, similarity, metadata, output_dir, signatures=signatures, vectors=vectors,
+                                       embeddings=embeddings)
+    return timer.results, new_df
+
+
+def time_calls(fn, args_list, warmup=10):
+    for args in args_list[:warmup]:
+        fn(*args)
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+def run_serving(artifacts_dir, new_df, samples, seed):
+    """Time the serving path against the freshly built artifacts."""
+    os.environ['ARTIFACTS_DIR'] = artifacts_dir
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie_recommender.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from core import artifacts, utils
+    from core.models import Movie
+
+    settings.ALLOWED_HOSTS = ['*']
+    setup_test_environment()
+    old_db_name = connection.creation.create_test_db(verbosity=0)
+    results = {}
+    try:
+        # Detail pages need the movie rows; only the fields the view reads
+        Movie.objects.bulk_create(
+            [Movie(tmdb_id=int(row.movie_id), title=row.title, vote_average=float(row.vote_average or 0))
+             for row in new_df[['movie_id', 'title', 'vote_average']].drop_duplicates('movie_id').itertuples()],
+            batch_size=2000,
+        )
+
+        start = time.perf_counter()
+        with RssSampler() as rss:
+            bundle = artifacts.reload_artifacts()
+        results['artifact_load'] = {'seconds': time.perf_counter() - start, 'stage_peak_rss_mb': rss.peak_mb,
+                                    'cumulative_peak_rss_mb': cumulative_peak_rss_mb()}
+        print(f"  {'artifact_load':<22} {results['artifact_load']['seconds'] * 1000:9.2f} ms")
+
+        rng = np.random.default_rng(seed)
+        rows = rng.integers(0, len(bundle.metadata), samples)
+        titles = [bundle.metadata.title[r] for r in rows]
+        ids = [int(bundle.metadata.movie_id[r]) for r in rows]
+        # Leading halves of real titles, so title search finds something
+        prefixes = [t[:max(3, len(t) // 2)] for t in titles]
+        genres = list(bundle.metadata.genre_names) or ['drama']
+        languages = list(bundle.metadata.language_names) or ['en']
+
+        cases = {
+            'get_recommendations': (utils.get_recommendations, [(t,) for t in titles]),
+            'search_title': (utils.search_movies, [(p, 'title') for p in prefixes]),
+            'search_genre': (utils.search_movies, [(genres[i % len(genres)], 'genre') for i in range(samples)]),
+            'search_language': (utils.search_movies, [(languages[i % len(languages)], 'language') for i in range(samples)]),
+        }
+        client = Client()
+        view_samples = max(1, samples // 10)
+        cases['view_movie_detail'] = (client.get, [(f'/movie/{i}/',) for i in ids[:view_samples]])
+        cases['view_search'] = (lambda q: client.get('/search/', {'q': q, 'type': 'title'}),
+                                [(p,) for p in prefixes[:view_samples]])
+        cases['view_index'] = (client.get, [('/',)] * view_samples)
+
+        for name, (fn, args_list) in cases.items():
+            results[name] = time_calls(fn, args_list)
+            r = results[name]
+            print(f"  {name:<22} p50 {r['p50_s'] * 1e6:9.1f} us   p99 {r['p99_s'] * 1e6:9.1f} us   "
+                  f"{r['throughput_per_s']:10.0f}/s")
+    finally:
+        connection.creation.destroy_test_db(old_db_name, verbosity=0)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """List of regression messages: metrics more than `tolerance` worse than the baseline."""
+    regressions = []
+
+    def check(label, now, before, floor):
+        if now is None or before is None:
+            return
+        if now > before * (1 + tolerance) and now - before > floor:
+            regressions.append(f"{label}: {before:.6g} -> {now:.6g} (+{(now / before - 1) * 100 if before else float('inf'):.0f}%)")
+
+    for stage, now in current.get('build', {}).items():
+        before = baseline.get('build', {}).get(stage)
+        if before:
+            check(f'build.{stage}.seconds', now['seconds'], before['seconds'], SECONDS_FLOOR)
+            # Only the per-stage peak: the cumulative one carries earlier stages' memory.
+            # Baselines from before it was recorded have no value and are skipped.
+            check(f'build.{stage}.stage_peak_rss_mb', now.get('stage_peak_rss_mb'), before.get('stage_peak_rss_mb'),
+                  RSS_FLOOR_MB)
+    for op, now in current.get('serve', {}).items():
+        before = baseline.get('serve', {}).get(op)
+        if not before:
+            continue
+        if 'seconds' in now:
+            check(f'serve.{op}.seconds', now['seconds'], before['seconds'], SECONDS_FLOOR)
+        for key in ('p50_s', 'p99_s'):
+            if key in now:
+                check(f'serve.{op}.{key}', now[key], before.get(key), LATENCY_FLOOR)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the model build and serving path.')
+    parser.add_argument('--movies', type=int, default=10000, help='Synthetic catalogue size (10k-1M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--samples', type=int, default=2000, help='Calls per serving benchmark')
+    parser.add_argument('--data-dir', help='Reuse an existing catalogue instead of generating one')
+    parser.add_argument('--weighting', choices=generate_models.WEIGHTINGS, default='tfidf')
+    parser.add_argument('--embedding-dims', type=int, default=0, help='Build neighbours from SVD embeddings')
+    parser.add_argument('--skip-serve', action='store_true', help='Only benchmark the build')
+    parser.add_argument('--output', help='Write results JSON here')
+    parser.add_argument('--baseline', help='Compare against this results JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before flagging (0.25 = 25%%)')
+    parser.add_argument('--verbose', action='store_true', help='Show generate_models.py output')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='recsys-bench-')
+    try:
+        data_dir = args.data_dir
+        if not data_dir:
+            data_dir = os.path.join(work_dir, 'data')
+            print(f"Generating {args.movies} synthetic movies...")
+            start = time.perf_counter()
+            write_catalog(data_dir, args.movies, args.seed)
+            print(f"  done in {time.perf_counter() - start:.1f} s")
+        output_dir = os.path.join(work_dir, 'artifacts')
+        os.makedirs(output_dir)
+
+        print("Build stages:")
+        build, new_df = run_build(data_dir, output_dir, args.movies, args.verbose, args.weighting,
+                                  args.embedding_dims)
+        results = {
+            'meta': {
+                'movies': args.movies,
+                'built_movies': int(len(new_df)),
+                'seed': args.seed,
+                'weighting': args.weighting,
+                'embedding_dims': args.embedding_dims,
+                'samples': args.samples,
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+            },
+            'build': build,
+        }
+        if not args.skip_serve:
+            print("Serving:")
+            results['serve'] = run_serving(output_dir, new_df, args.samples, args.seed)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('movies') != args.movies:
+            print(f"Warning: baseline was run with {baseline.get('meta', {}).get('movies')} movies, not {args.movies}.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
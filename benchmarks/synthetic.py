@@ -0,0 +1,184 @@
+"""
+Synthetic catalogue shaped like the Kaggle "The Movies Dataset" CSVs that
+generate_models.py reads (movies_metadata.csv, credits.csv, keywords.csv).
+
+Movies are grouped into topics (franchises) that share genres, keywords,
+cast, a director and part of their overview vocabulary, so similarity
+results have structure to find. A small share of rows is malformed the
+way the real file is (bad ids, missing dates, missing overviews).
+
+    python benchmarks/synthetic.py --movies 100000 --out /tmp/catalog
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+GENRES = [
+    (28, 'Action'), (12, 'Adventure'), (16, 'Animation'), (35, 'Comedy'), (80, 'Crime'),
+    (99, 'Documentary'), (18, 'Drama'), (10751, 'Family'), (14, 'Fantasy'), (36, 'History'),
+    (27, 'Horror'), (10402, 'Music'), (9648, 'Mystery'), (10749, 'Romance'), (878, 'Science Fiction'),
+    (10770, 'TV Movie'), (53, 'Thriller'), (10752, 'War'), (37, 'Western'), (10769, 'Foreign'),
+]
+LANGUAGES = ['en'] * 14 + ['fr', 'fr', 'it', 'ja', 'de', 'es', 'ru', 'hi', 'ml', 'ko', 'zh']
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'tor', 'va', 'zu', 'bel', 'dra', 'fen', 'gor', 'hal',
+             'is', 'jun', 'kel', 'mor', 'nix', 'ol', 'pra', 'quin', 'sar', 'tev', 'ul', 'wyn']
+CREW_JOBS = ['Producer', 'Screenplay', 'Editor', 'Original Music Composer', 'Director of Photography',
+             'Casting', 'Art Direction', 'Costume Design', 'Sound Designer', 'Visual Effects Supervisor']
+
+
+def _words(rng, count):
+    """Distinct pseudo-words built from 2-4 syllables (up to ~350k of them)."""
+    words = set()
+    while len(words) < count:
+        n = rng.integers(2, 5)
+        words.add(''.join(rng.choice(SYLLABLES, n)))
+    return sorted(words)
+
+
+def _names(rng, count):
+    first = [w.capitalize() for w in _words(rng, 300)]
+    last = [w.capitalize() for w in _words(rng, 600)]
+    return [f'{first[i % len(first)]} {last[(i * 7919) % len(last)]}' for i in rng.permutation(count)]
+
+
+def _literal(items):
+    # The real CSVs hold Python literals (single quotes), parsed with ast.literal_eval
+    return repr(items)
+
+
+def generate_catalog(n_movies, seed=0):
+    """Return (movies, credits, keywords) DataFrames with n_movies rows each."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(_words(rng, 20000))
+    keywords_pool = _words(rng, 3000)
+    people = _names(rng, max(2000, n_movies // 4))
+    n_topics = max(10, n_movies // 40)
+
+    # Zipf-ish global word frequencies, like overview text
+    ranks = np.arange(1, len(vocab) + 1)
+    word_p = 1.0 / ranks
+    word_p /= word_p.sum()
+
+    topic_genres = [rng.choice(len(GENRES), rng.integers(1, 4), replace=False) for _ in range(n_topics)]
+    topic_keywords = [rng.choice(len(keywords_pool), 6, replace=False) for _ in range(n_topics)]
+    topic_cast = [rng.choice(len(people), 8, replace=False) for _ in range(n_topics)]
+    topic_director = rng.integers(0, len(people), n_topics)
+    topic_vocab = rng.integers(0, len(vocab) - 200, n_topics)
+    topic_name = [' '.join(w.capitalize() for w in rng.choice(vocab[:5000], 2)) for _ in range(n_topics)]
+    topic_is_collection = rng.random(n_topics) < 0.3
+
+    topic = rng.integers(0, n_topics, n_movies)
+    ids = rng.choice(np.arange(2, n_movies * 10), n_movies, replace=False)
+    years = rng.integers(1920, 2018, n_movies)
+    vote_count = np.floor(rng.pareto(1.2, n_movies) * 20).astype(int)
+    vote_average = np.where(vote_count > 0, np.clip(rng.normal(6.2, 1.1, n_movies), 0, 10).round(1), 0.0)
+    popularity = (rng.pareto(1.5, n_movies) * 2).round(6)
+    overview_len = rng.integers(15, 70, n_movies)
+    global_words = rng.choice(vocab, int(overview_len.sum()), p=word_p)
+
+    movie_rows, credit_rows, keyword_rows = [], [], []
+    sequel_counter = {}
+    offset = 0
+    for i in range(n_movies):
+        t = topic[i]
+        length = overview_len[i]
+        words = list(global_words[offset:offset + length])
+        offset += length
+        # About a third of the overview comes from the topic's own vocabulary
+        start = topic_vocab[t]
+        for j in rng.integers(0, length, length // 3):
+            words[j] = vocab[start + rng.integers(0, 200)]
+        overview = ' '.join(words).capitalize() + '.'
+
+        genres = [{'id': GENRES[g][0], 'name': GENRES[g][1]} for g in topic_genres[t]]
+        if rng.random() < 0.2:
+            extra = GENRES[rng.integers(0, len(GENRES))]
+            if extra[1] not in {g['name'] for g in genres}:
+                genres.append({'id': extra[0], 'name': extra[1]})
+
+        if topic_is_collection[t]:
+            part = sequel_counter[t] = sequel_counter.get(t, 0) + 1
+            title = topic_name[t] if part == 1 else f'{topic_name[t]} {part}'
+            collection = _literal({'id': int(100000 + t), 'name': f'{topic_name[t]} Collection',
+                                   'poster_path': f'/c{t}.jpg', 'backdrop_path': f'/cb{t}.jpg'})
+        else:
+            title = ' '.join(w.capitalize() for w in rng.choice(vocab[:8000], rng.integers(1, 4)))
+            collection = np.nan
+
+        release_date = f'{years[i]}-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}'
+        if rng.random() < 0.002:
+            release_date = np.nan
+        if rng.random() < 0.02:
+            overview = np.nan
+
+        movie_rows.append({
+            'adult': 'False',
+            'belongs_to_collection': collection,
+            'budget': str(int(rng.integers(0, 200) * 1e6) if rng.random() < 0.3 else 0),
+            'genres': _literal(genres),
+            'homepage': np.nan,
+            'id': str(ids[i]),
+            'imdb_id': f'tt{ids[i]:07d}',
+            'original_language': LANGUAGES[rng.integers(0, len(LANGUAGES))],
+            'original_title': title,
+            'overview': overview,
+            'popularity': str(popularity[i]),
+            'poster_path': f'/{ids[i]:x}.jpg' if rng.random() < 0.97 else np.nan,
+            'production_companies': _literal([{'name': 'Synthetic Pictures', 'id': 1}]),
+            'production_countries': _literal([{'iso_3166_1': 'US', 'name': 'United States of America'}]),
+            'release_date': release_date,
+            'revenue': 0.0,
+            'runtime': float(rng.integers(70, 180)),
+            'spoken_languages': _literal([{'iso_639_1': 'en', 'name': 'English'}]),
+            'status': 'Released',
+            'tagline': np.nan,
+            'title': title,
+            'video': False,
+            'vote_average': vote_average[i],
+            'vote_count': float(vote_count[i]),
+        })
+
+        cast_ids = list(topic_cast[t][:4]) + list(rng.integers(0, len(people), rng.integers(4, 12)))
+        cast = [{'cast_id': k, 'character': f'Role {k}', 'credit_id': f'{ids[i]:x}{k}', 'gender': int(k % 3),
+                 'id': int(p), 'name': people[p], 'order': k, 'profile_path': None}
+                for k, p in enumerate(cast_ids)]
+        crew = [{'credit_id': f'{ids[i]:x}d', 'department': 'Directing', 'gender': 2, 'id': int(topic_director[t]),
+                 'job': 'Director', 'name': people[topic_director[t]], 'profile_path': None}]
+        # The real crew column is the biggest field in the dataset
+        for k, p in enumerate(rng.integers(0, len(people), rng.integers(5, 25))):
+            job = CREW_JOBS[k % len(CREW_JOBS)]
+            crew.append({'credit_id': f'{ids[i]:x}c{k}', 'department': 'Crew', 'gender': 0, 'id': int(p),
+                         'job': job, 'name': people[p], 'profile_path': None})
+        credit_rows.append({'cast': _literal(cast), 'crew': _literal(crew), 'id': int(ids[i])})
+
+        kw = list(rng.choice(topic_keywords[t], rng.integers(1, 6), replace=False))
+        kw += list(rng.integers(0, len(keywords_pool), rng.integers(0, 3)))
+        keyword_rows.append({'id': int(ids[i]), 'keywords': _literal([{'id': int(k), 'name': keywords_pool[k]} for k in kw])})
+
+    movies = pd.DataFrame(movie_rows)
+    # A few broken rows, like the shifted-column lines in the real file
+    bad = rng.choice(n_movies, max(1, n_movies // 15000), replace=False)
+    movies.loc[bad, 'id'] = '1997-08-20'
+    return movies, pd.DataFrame(credit_rows), pd.DataFrame(keyword_rows)
+
+
+def write_catalog(data_dir, n_movies, seed=0):
+    """Write the three CSVs into data_dir, ready for generate_models.load_data(data_dir)."""
+    os.makedirs(data_dir, exist_ok=True)
+    movies, credits, keywords = generate_catalog(n_movies, seed)
+    movies.to_csv(os.path.join(data_dir, 'movies_metadata.csv'), index=False)
+    credits.to_csv(os.path.join(data_dir, 'credits.csv'), index=False)
+    keywords.to_csv(os.path.join(data_dir, 'keywords.csv'), index=False)
+    return data_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help='Folder for the CSV files')
+    args = parser.parse_args()
+    write_catalog(args.out, args.movies, args.seed)
+    print(f"Wrote {args.movies} synthetic movies to {args.out}")
@@ -1,41 +1,47 @@
 import pandas as pd
 import numpy as np
+import argparse
 import ast
+import hashlib
 import pickle
 import os
+import json
+import time
+from datetime import datetime, timezone
+import scipy.sparse
+from sklearn.decomposition import TruncatedSVD
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 from nltk.stem.porter import PorterStemmer
 
+import tmdb_data
+
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 OUTPUT_DIR = BASE_DIR # Save to root as per utils.py expectation
+# Written only by some builds (save_artifacts)
+OPTIONAL_ARTIFACTS = ['signatures.npy', 'tag_vectors.npz', 'embeddings.npy']
+
+# Text fields vectorized separately (see vectorize); 'tags' is all of them joined
+FIELDS = ['overview', 'genres', 'keywords', 'cast', 'crew']
+WEIGHTINGS = ['count', 'tfidf', 'bm25']
+# Relative say of each field in the cosine. Overviews are long, so with one
+# shared vocabulary they drowned out the genre/keyword/cast/director signal.
+FIELD_WEIGHTS = {'overview': 1.0, 'genres': 0.5, 'keywords': 1.0, 'cast': 0.75, 'crew': 0.75}
 
-def load_data():
+# Stage outputs are cached here between runs (see StageCache)
+CACHE_DIR = os.path.join(BASE_DIR, '.build_cache')
+STAGES = ['load', 'preprocess', 'stem', 'vectorize', 'embed', 'similarity', 'signatures']
+# Bump a stage's version when its code changes, so older cached output is ignored
+STAGE_VERSIONS = {'load': 2, 'preprocess': 1, 'stem': 1, 'vectorize': 1, 'embed': 1, 'similarity': 1, 'signatures': 1}
+
+def load_data(data_dir=DATA_DIR, engine='c'):
+    # Pruned columns, bad rows dropped and crew cut to the director before merging
+    # (see tmdb_data); the stage cache below keeps the result between builds
     print("Loading datasets...")
-    movies = pd.read_csv(os.path.join(DATA_DIR, 'movies_metadata.csv'), low_memory=False)
-    credits = pd.read_csv(os.path.join(DATA_DIR, 'credits.csv'))
-    keywords = pd.read_csv(os.path.join(DATA_DIR, 'keywords.csv'))
-    
-    # Filter bad data (movies with valid dates and votes usually implies valid entries)
-    # The 45k dataset has some bad rows
-    movies = movies[movies['release_date'].notna()]
-    
-    # Convert ID to numeric and handle errors
-    movies['id'] = pd.to_numeric(movies['id'], errors='coerce')
-    movies = movies.dropna(subset=['id'])
-    movies['id'] = movies['id'].astype(int)
-    
-    credits['id'] = credits['id'].astype(int)
-    keywords['id'] = keywords['id'].astype(int)
-    
-    # Merge
-    print("Merging datasets...")
-    movies = movies.merge(credits, on='id')
-    movies = movies.merge(keywords, on='id')
-    
-    return movies
+    return tmdb_data.load_catalog(data_dir, engine)
 
 def convert(obj):
     try:
@@ -60,6 +66,13 @@ def convert3(obj):
     except:
         return []
 
+def fetch_collection(obj):
+    # belongs_to_collection holds one dict literal, or nothing
+    try:
+        return int(ast.literal_eval(obj)['id'])
+    except:
+        return 0
+
 def fetch_director(obj):
     try:
         L = []
@@ -75,9 +88,12 @@ def preprocess_data(movies):
     print("Preprocessing data...")
     # Select important columns
     # 'id' is TMDB ID
-    movies = movies[['id', 'title', 'overview', 'genres', 'keywords', 'cast', 'crew', 'popularity', 'release_date', 'vote_average', 'vote_count']]
+    movies = movies[['id', 'title', 'overview', 'genres', 'keywords', 'cast', 'crew', 'popularity', 'release_date', 'vote_average', 'vote_count', 'poster_path', 'original_language', 'belongs_to_collection']].copy()
     
-    # Handle missing values
+    # Handle missing values (a missing poster, language or collection is fine, the site copes without)
+    movies['poster_path'] = movies['poster_path'].fillna('')
+    movies['original_language'] = movies['original_language'].fillna('')
+    movies['belongs_to_collection'] = movies['belongs_to_collection'].fillna('')
     movies.dropna(inplace=True)
     
     # Extract tags
@@ -87,6 +103,12 @@ def preprocess_data(movies):
     movies['crew'] = movies['crew'].apply(fetch_director)
     movies['overview'] = movies['overview'].apply(lambda x: x.split())
     
+    # Keep the readable genre names for the serving metadata (genre search)
+    movies['genre_names'] = movies['genres']
+    # Director and collection ids let the site avoid five films from one franchise
+    movies['director'] = movies['crew'].apply(lambda x: x[0] if x else '')
+    movies['collection_id'] = movies['belongs_to_collection'].apply(fetch_collection)
+    
     # Clean spaces
     def collapse(L):
         L1 = []
@@ -99,13 +121,13 @@ def preprocess_data(movies):
     movies['cast'] = movies['cast'].apply(collapse)
     movies['crew'] = movies['crew'].apply(collapse)
     
-    # Create tags column
-    movies['tags'] = movies['overview'] + movies['genres'] + movies['keywords'] + movies['cast'] + movies['crew']
+    # One lowercase text column per field, and the tags column joining them
+    for field in FIELDS:
+        movies[field] = movies[field].apply(lambda x: " ".join(x).lower())
+    movies['tags'] = movies[FIELDS].apply(" ".join, axis=1)
     
     # Final dataframe
-    new_df = movies[['id', 'title', 'tags', 'popularity', 'release_date', 'vote_average', 'vote_count']].copy()
-    new_df['tags'] = new_df['tags'].apply(lambda x: " ".join(x))
-    new_df['tags'] = new_df['tags'].apply(lambda x: x.lower())
+    new_df = movies[['id', 'title', 'tags'] + FIELDS + ['popularity', 'release_date', 'vote_average', 'vote_count', 'poster_path', 'original_language', 'genre_names', 'director', 'collection_id']].copy()
     
     # Rename id to movie_id for consistency with some parts of app, but 'id' is standard TMDB
     new_df.rename(columns={'id': 'movie_id'}, inplace=True)
@@ -122,22 +144,90 @@ def stem_text(text):
         y.append(ps.stem(i))
     return " ".join(y)
 
-def generate_similarity(new_df):
+def stem_tags(new_df):
     print("Stemming tags...")
-    new_df['tags'] = new_df['tags'].apply(stem_text)
-    
-    print("Vectorizing...")
-    cv = CountVectorizer(max_features=5000, stop_words='english')
-    vectors = cv.fit_transform(new_df['tags']) # Keep sparse for speed
-    
+    # Only the free-text fields; genres and names are already single tokens
+    for field in ['overview', 'keywords']:
+        new_df[field] = new_df[field].apply(stem_text)
+    new_df['tags'] = new_df[FIELDS].apply(" ".join, axis=1)
+    return new_df
+
+def weight_counts(counts, weighting, k1=1.2, b=0.75):
+    """
+    Apply a term weighting to a CSR count matrix (rows = movies):
+    'count' keeps raw counts, 'tfidf' uses sublinear tf * smoothed idf,
+    'bm25' uses saturated, length-normalized tf * BM25 idf.
+    """
+    counts = counts.astype(np.float32).tocsr()
+    if weighting == 'count':
+        return counts
+    n = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    if weighting == 'tfidf':
+        idf = np.log((1 + n) / (1 + df)) + 1
+        counts.data = (1 + np.log(counts.data)) * idf[counts.indices]
+    elif weighting == 'bm25':
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() or 1.0
+        row_len = np.repeat(doc_len, np.diff(counts.indptr))
+        tf = counts.data
+        counts.data = idf[counts.indices] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * row_len / avg_len))
+    else:
+        raise ValueError(f"Unknown weighting {weighting!r}, expected one of {WEIGHTINGS}")
+    counts.data = counts.data.astype(np.float32)
+    return counts
+
+def vectorize(new_df, weighting='tfidf', field_weights=None):
+    """
+    L2-normalized CSR matrix of tag vectors, one row per movie.
+    Each field gets its own vocabulary and weighting; the per-field blocks
+    are L2-normalized and scaled by sqrt(field weight) before stacking, so
+    the cosine of two movies is the field-weighted mean of per-field cosines.
+    """
+    print(f"Vectorizing ({weighting})...")
+    field_weights = {**FIELD_WEIGHTS, **(field_weights or {})}
+    blocks = []
+    for field in FIELDS:
+        weight = field_weights.get(field, 0)
+        if not weight:
+            continue
+        if field == 'overview':
+            cv = CountVectorizer(max_features=5000, stop_words='english', dtype=np.float32)
+        else:
+            # Names and keywords are collapsed into single tokens (tomhanks);
+            # one that appears once can't link two movies
+            cv = CountVectorizer(token_pattern=r'\S+', lowercase=False, min_df=2, dtype=np.float32)
+        try:
+            counts = cv.fit_transform(new_df[field])
+        except ValueError:
+            continue # empty vocabulary
+        blocks.append(normalize(weight_counts(counts, weighting)) * np.float32(np.sqrt(weight)))
+    if not blocks:
+        return scipy.sparse.csr_matrix((len(new_df), 0), dtype=np.float32)
+    return normalize(scipy.sparse.hstack(blocks, format='csr')) # Keep sparse for speed
+
+def top_k_rows(block_scores, top_k):
+    """Column indices and scores of the top_k values of each row, best first."""
+    # argpartition is faster than sort for just getting top k
+    top_indices = np.argpartition(block_scores, -top_k, axis=1)[:, -top_k:]
+    top_scores = np.take_along_axis(block_scores, top_indices, axis=1)
+    # Sort these top K so highest is first
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(top_indices, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+def compute_similarity(vectors, top_k=50):
     # Optimization: To avoid MemoryError with 45k x 45k float matrix (16GB+ RAM)
-    # We will compute cosine similarity in chunks and ONLY store the top 20 indices
+    # We will compute cosine similarity in chunks and ONLY store the top 50 indices
     
     n_movies = vectors.shape[0]
-    # We store indices of top similar movies. 20 should be enough for recommendations.
+    # We store indices of top similar movies. 50 leaves the serve-time re-ranking
+    # and diversity steps room to pick 5 from.
     # Using int32 to save space.
-    top_k = 20
+    top_k = min(top_k, n_movies)
     similarity_indices = np.zeros((n_movies, top_k), dtype=np.int32)
+    # Cosine scores of those neighbours, used by the serve-time re-ranker
+    similarity_scores = np.zeros((n_movies, top_k), dtype=np.float16)
     
     print(f"Calculating similarity for {n_movies} movies (Chunked)...")
     
@@ -146,49 +236,341 @@ def generate_similarity(new_df):
         end = min(i + chunk_size, n_movies)
         
         # Compute similarity for this chunk against ALL movies
-        # vectors[i:end] shape: (chunk_size, 5000)
-        # vectors shape: (n_movies, 5000)
+        # vectors[i:end] shape: (chunk_size, n_features)
+        # vectors shape: (n_movies, n_features)
         # Result shape: (chunk_size, n_movies)
         # This will still use some RAM but much less than full matrix
         # (1000 * 45000 * 8 bytes ≈ 360MB) - perfectly safe
         
         sim_chunk = cosine_similarity(vectors[i:end], vectors)
-        
-        # For each row in chunk, find top K
-        # argsort gives indices of sorted elements (ascending)
-        # we take last k (highest scores) and reverse to get descending
-        
-        for idx_in_chunk, row_sim in enumerate(sim_chunk):
-            real_idx = i + idx_in_chunk
-            # Get indices of top K highest values
-            # argpartition is faster than sort for just getting top k
-            top_indices = np.argpartition(row_sim, -top_k)[-top_k:]
-            
-            # Sort these top K so highest is first
-            top_scores = row_sim[top_indices]
-            sorted_top_indices = top_indices[np.argsort(top_scores)[::-1]]
-            
-            similarity_indices[real_idx] = sorted_top_indices
+        similarity_indices[i:end], similarity_scores[i:end] = top_k_rows(sim_chunk, top_k)
             
         print(f"Processed {end}/{n_movies}")
 
-    return similarity_indices
+    return similarity_indices, similarity_scores
 
-def main():
-    movies = load_data()
-    print(f"Loaded {len(movies)} movies.")
-    
-    new_df = preprocess_data(movies)
+def compute_embeddings(vectors, dims=128, seed=0):
+    """
+    Dense float32 item embeddings: randomized truncated SVD of the tag
+    matrix, L2-normalized so dot products are cosines. Smooths out the
+    noise of the sparse vectors and makes exact top-K a dense matmul.
+    """
+    print(f"Projecting {vectors.shape[1]} features to {dims} dimensions (truncated SVD)...")
+    dims = min(dims, vectors.shape[1] - 1)
+    svd = TruncatedSVD(n_components=dims, algorithm='randomized', n_iter=5, random_state=seed)
+    embeddings = svd.fit_transform(vectors).astype(np.float32)
+    print(f"Explained variance: {svd.explained_variance_ratio_.sum():.2f}")
+    return normalize(embeddings).astype(np.float32)
+
+def compute_dense_similarity(embeddings, top_k=50, block_size=2048):
+    """Exact top-K neighbours of L2-normalized embeddings by blocked matrix multiply."""
+    n_movies = embeddings.shape[0]
+    top_k = min(top_k, n_movies)
+    similarity_indices = np.zeros((n_movies, top_k), dtype=np.int32)
+    similarity_scores = np.zeros((n_movies, top_k), dtype=np.float16)
     
-    similarity = generate_similarity(new_df)
+    print(f"Calculating dense similarity for {n_movies} movies...")
+    # One block is block_size x n_movies float32 (2048 * 45000 * 4 bytes ≈ 370MB)
+    for i in range(0, n_movies, block_size):
+        end = min(i + block_size, n_movies)
+        block = embeddings[i:end] @ embeddings.T
+        similarity_indices[i:end], similarity_scores[i:end] = top_k_rows(block, top_k)
+    print(f"Processed {n_movies}/{n_movies}")
     
+    return similarity_indices, similarity_scores
+
+def compute_signatures(vectors, dims=64, seed=0):
+    """
+    Compact float16 signature per movie: a Gaussian random projection of the
+    L2-normalized tag vector, normalized again. Dot products of signatures
+    approximate the cosine of the tag vectors, which is all the serve-time
+    diversity step needs to spot near-duplicates among 50 candidates.
+    """
+    rng = np.random.default_rng(seed)
+    projection = rng.standard_normal((vectors.shape[1], dims)).astype(np.float32)
+    signatures = np.asarray(normalize(vectors) @ projection, dtype=np.float32)
+    return normalize(signatures).astype(np.float16)
+
+def build_metadata(new_df):
+    """
+    Build the compact struct-of-arrays metadata store served by the web app.
+    Row i describes the same movie as row i of the similarity matrix.
+    Strings are stored as NUL-separated UTF-8 tables; genres and languages
+    are interned into small integer codes.
+    """
+    def string_table(values):
+        text = '\0'.join(str(v).replace('\0', '') for v in values)
+        return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+    release = pd.to_datetime(new_df['release_date'], errors='coerce')
+
+    # Genres as CSR: codes of row i are genre_codes[genre_offsets[i]:genre_offsets[i + 1]]
+    genre_names = sorted({g for genres in new_df['genre_names'] for g in genres})
+    genre_index = {g: code for code, g in enumerate(genre_names)}
+    genre_lengths = new_df['genre_names'].apply(len).to_numpy()
+    genre_offsets = np.zeros(len(new_df) + 1, dtype=np.int32)
+    np.cumsum(genre_lengths, out=genre_offsets[1:])
+    genre_codes = np.array([genre_index[g] for genres in new_df['genre_names'] for g in genres], dtype=np.int16)
+
+    language_code, language_names = pd.factorize(new_df['original_language'].astype(str).str.lower())
+    # Unknown director / no collection -> -1
+    director_code, _ = pd.factorize(new_df['director'].replace('', np.nan))
+    collection_code, _ = pd.factorize(new_df['collection_id'].replace(0, np.nan))
+
+    return {
+        'movie_id': new_df['movie_id'].to_numpy(dtype=np.int32),
+        'title': string_table(new_df['title']),
+        'year': release.dt.year.fillna(0).to_numpy(dtype=np.int16),
+        'vote_average': pd.to_numeric(new_df['vote_average'], errors='coerce').fillna(0).to_numpy(dtype=np.float32),
+        'vote_count': pd.to_numeric(new_df['vote_count'], errors='coerce').fillna(0).to_numpy(dtype=np.int32),
+        'popularity': pd.to_numeric(new_df['popularity'], errors='coerce').fillna(0).to_numpy(dtype=np.float32),
+        'poster_path': string_table(new_df['poster_path']),
+        'genre_offsets': genre_offsets,
+        'genre_codes': genre_codes,
+        'genre_names': string_table(genre_names),
+        'genre_count': np.int32(len(genre_names)),
+        'language_code': language_code.astype(np.int16),
+        'language_names': string_table(language_names),
+        'language_count': np.int32(len(language_names)),
+        'director_code': director_code.astype(np.int32),
+        'collection_code': collection_code.astype(np.int32),
+    }
+
+def write_atomic(path, write):
+    """
+    Write a file through a temporary name next to it and os.replace it into
+    place. Readers see the old file or the new one, never a partial one, and
+    workers that memory-mapped the old file keep its inode.
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+def save_artifacts(new_df, similarity, metadata, output_dir=OUTPUT_DIR, build_seconds=None, signatures=None,
+                   vectors=None, params=None, embeddings=None):
+    # similarity is the (indices, scores) pair returned by compute_similarity
+    similarity, scores = similarity
     print("Saving models...")
-    pickle.dump(new_df, open(os.path.join(OUTPUT_DIR, 'movies.pkl'), 'wb'))
-    pickle.dump(similarity, open(os.path.join(OUTPUT_DIR, 'similarity.pkl'), 'wb'))
+
+    def save(name, write):
+        write_atomic(os.path.join(output_dir, name), write)
+        files.append(name)
+
+    files = []
+    save('movies.pkl', lambda f: pickle.dump(new_df, f))
+    save('similarity.npy', lambda f: np.save(f, similarity))
+    save('similarity_scores.npy', lambda f: np.save(f, scores))
+    if signatures is not None:
+        save('signatures.npy', lambda f: np.save(f, signatures))
+    if vectors is not None:
+        # The L2-normalized tag vectors, for query paths that need more than the stored neighbours
+        save('tag_vectors.npz', lambda f: scipy.sparse.save_npz(f, vectors.tocsr()))
+    if embeddings is not None:
+        # Plain .npy so the web app can memory-map it
+        save('embeddings.npy', lambda f: np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32)))
+    save('movie_meta.npz', lambda f: np.savez(f, **metadata))
+    # Optional files an earlier build left in output_dir would otherwise be served with this one
+    for name in OPTIONAL_ARTIFACTS:
+        if name not in files and os.path.exists(os.path.join(output_dir, name)):
+            os.remove(os.path.join(output_dir, name))
+    
+    # Written last: the web app reloads an unversioned folder when the
+    # manifest changes, by which time every file above is in place.
+    # It reports this version and publish_artifacts uses it as the build name.
+    manifest = {
+        'version': datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S'),
+        'movies': int(len(new_df)),
+        'files': files,
+        # Per-stage wall time, reported by manage.py evaluate_artifacts
+        'build_seconds': build_seconds or {},
+        # How the tag vectors were built
+        'params': params or {},
+    }
+    write_atomic(os.path.join(output_dir, 'manifest.json'),
+                 lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
     
     print("Done! Files saved to:")
-    print(os.path.join(OUTPUT_DIR, 'movies.pkl'))
-    print(os.path.join(OUTPUT_DIR, 'similarity.pkl'))
+    for name in files + ['manifest.json']:
+        print(os.path.join(output_dir, name))
+
+class StageCache:
+    """
+    On-disk cache of build stage outputs. Each entry is keyed by a hash of
+    the stage name and version, its parameters and the key of the stage it
+    was computed from, so changing a parameter only invalidates that stage
+    and the ones after it. DataFrames are pickled, arrays saved as .npy and
+    sparse matrices as .npz; writes are atomic, so a crash never leaves a
+    half-written entry behind.
+    """
+    KEEP = 2 # entries kept per stage
+
+    def __init__(self, cache_dir=CACHE_DIR, from_stage=None, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        # Stages recomputed even when cached: from_stage and everything after it
+        self.recompute = set(STAGES[STAGES.index(from_stage):]) if from_stage else set()
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(stage, *parts):
+        text = json.dumps([stage, STAGE_VERSIONS[stage], *parts], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def file_key(paths):
+        """Key of input files: path, size and modification time."""
+        stats = []
+        for path in paths:
+            st = os.stat(path)
+            stats.append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+        return StageCache.key('load', stats)
+
+    def _find(self, stage, key):
+        prefix = f'{stage}-{key}.'
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and not name.endswith('.tmp'):
+                return os.path.join(self.cache_dir, name)
+        return None
+
+    def hit(self, stage, key):
+        return self.enabled and stage not in self.recompute and self._find(stage, key) is not None
+
+    def get(self, stage, key):
+        path = self._find(stage, key)
+        print(f"Using cached {stage} ({os.path.basename(path)})")
+        if path.endswith('.frame.pkl'):
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        if path.endswith('.sparse.npz'):
+            return scipy.sparse.load_npz(path)
+        if path.endswith('.arrays.npz'):
+            with np.load(path, allow_pickle=False) as data:
+                return tuple(data[f'arr_{i}'] for i in range(len(data.files)))
+        return np.load(path, allow_pickle=False)
+
+    def put(self, stage, key, value):
+        if not self.enabled:
+            return value
+        if isinstance(value, pd.DataFrame):
+            suffix = 'frame.pkl'
+        elif scipy.sparse.issparse(value):
+            suffix = 'sparse.npz'
+        elif isinstance(value, tuple):
+            suffix = 'arrays.npz'
+        else:
+            suffix = 'array.npy'
+        path = os.path.join(self.cache_dir, f'{stage}-{key}.{suffix}')
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            if suffix == 'frame.pkl':
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            elif suffix == 'sparse.npz':
+                scipy.sparse.save_npz(f, value.tocsr())
+            elif suffix == 'arrays.npz':
+                np.savez(f, *value)
+            else:
+                np.save(f, value)
+        os.replace(tmp, path)
+        self._prune(stage)
+        return value
+
+    def _prune(self, stage):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.startswith(f'{stage}-') and not name.endswith('.tmp')]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.KEEP:]:
+            os.remove(path)
+
+def parse_field_weights(text):
+    """'genres=2,cast=0.5' -> {'genres': 2.0, 'cast': 0.5}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        field, sep, value = item.partition('=')
+        if not sep or field.strip() not in FIELDS:
+            raise argparse.ArgumentTypeError(f"expected FIELD=WEIGHT with FIELD one of {FIELDS}, got {item!r}")
+        try:
+            weight = float(value)
+        except ValueError:
+            weight = None
+        # NaN, infinite or negative weights would only fail after the slow stages, in vectorize
+        if weight is None or not np.isfinite(weight) or weight < 0:
+            raise argparse.ArgumentTypeError(f"weight of {field.strip()} should be a number >= 0, got {value.strip()!r}")
+        weights[field.strip()] = weight
+    return weights
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the recommendation artifacts from the TMDB CSVs in data/.')
+    parser.add_argument('--weighting', choices=WEIGHTINGS, default='tfidf', help='Term weighting (default: tfidf)')
+    parser.add_argument('--field-weights', type=parse_field_weights, default={}, metavar='FIELD=WEIGHT,...',
+                        help=f'Override the per-field weights {FIELD_WEIGHTS}; 0 drops a field')
+    parser.add_argument('--embedding-dims', type=int, default=0, metavar='N',
+                        help='Compute neighbours from N-dimensional SVD embeddings (64-256; default 0: sparse cosine)')
+    parser.add_argument('--csv-engine', choices=tmdb_data.CSV_ENGINES, default='c',
+                        help='pandas CSV parser; pyarrow is multithreaded if installed (default: c)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Folder with the TMDB CSVs (default: data/)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Where to write the artifacts (default: repo root)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Stage cache folder (default: .build_cache/)')
+    parser.add_argument('--from-stage', choices=STAGES, help='Recompute this stage and the ones after it, even if cached')
+    parser.add_argument('--force', action='store_true', help='Ignore cached stages and recompute everything')
+    parser.add_argument('--no-cache', action='store_true', help="Don't read or write the stage cache")
+    args = parser.parse_args(argv)
+    if args.embedding_dims and not 2 <= args.embedding_dims <= 1024:
+        parser.error('--embedding-dims should be between 2 and 1024 (64-256 recommended)')
+    params = {'weighting': args.weighting, 'field_weights': {**FIELD_WEIGHTS, **args.field_weights},
+              'embedding_dims': args.embedding_dims}
+    
+    cache = StageCache(args.cache_dir, 'load' if args.force else args.from_stage, enabled=not args.no_cache)
+    build_seconds = {}
+    
+    def stage(name, key, fn, *args):
+        # Cached output if there is any, else run the stage and cache its output
+        start = time.perf_counter()
+        if cache.hit(name, key):
+            result = cache.get(name, key)
+        else:
+            result = cache.put(name, key, fn(*args))
+        build_seconds[name] = round(time.perf_counter() - start, 3)
+        return result
+    
+    # Keys chain from the input files through every parameter a stage uses
+    load_key = StageCache.file_key([os.path.join(args.data_dir, name)
+                                    for name in ['movies_metadata.csv', 'credits.csv', 'keywords.csv']])
+    preprocess_key = StageCache.key('preprocess', load_key)
+    stem_key = StageCache.key('stem', preprocess_key)
+    vectorize_key = StageCache.key('vectorize', stem_key, params['weighting'], params['field_weights'])
+    
+    # Stemmed tags in the cache make loading and preprocessing unnecessary
+    if cache.hit('stem', stem_key):
+        new_df = stage('stem', stem_key, None)
+    else:
+        if cache.hit('preprocess', preprocess_key):
+            new_df = stage('preprocess', preprocess_key, None)
+        else:
+            movies = stage('load', load_key, load_data, args.data_dir, args.csv_engine)
+            print(f"Loaded {len(movies)} movies.")
+            new_df = stage('preprocess', preprocess_key, preprocess_data, movies)
+            del movies
+        new_df = stage('stem', stem_key, stem_tags, new_df)
+    
+    # Cheap, and unaffected by stemming
+    metadata = build_metadata(new_df)
+    
+    vectors = stage('vectorize', vectorize_key, vectorize, new_df, args.weighting, args.field_weights)
+    embeddings = None
+    if args.embedding_dims:
+        embed_key = StageCache.key('embed', vectorize_key, args.embedding_dims)
+        embeddings = stage('embed', embed_key, compute_embeddings, vectors, args.embedding_dims)
+        similarity = stage('similarity', StageCache.key('similarity', embed_key), compute_dense_similarity, embeddings)
+        # The embeddings are better signatures than a random projection
+        signatures = embeddings.astype(np.float16)
+    else:
+        similarity = stage('similarity', StageCache.key('similarity', vectorize_key), compute_similarity, vectors)
+        signatures = stage('signatures', StageCache.key('signatures', vectorize_key), compute_signatures, vectors)
+    
+    save_artifacts(new_df, similarity, metadata, output_dir=args.output_dir, build_seconds=build_seconds,
+                   signatures=signatures, vectors=vectors, params=params, embeddings=embeddings)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,286 @@
+"""
+Recommendation artifacts as immutable, hot-swappable bundles.
+
+A bundle is loaded once and never mutated. Request code grabs the current
+bundle with get_bundle() and uses that object for the whole request, so a
+swap never changes data under an in-flight request. A new bundle is loaded
+when:
+
+- the artifacts change on disk (checked at most every
+  settings.ARTIFACTS_RELOAD_INTERVAL seconds),
+- the worker receives SIGHUP (see install_reload_signal), or
+- reload_artifacts() is called.
+
+Versioned layout: ARTIFACTS_DIR/CURRENT holds the name of a build folder
+next to it (written atomically by `manage.py publish_artifacts`). Without
+CURRENT the artifact files are read from ARTIFACTS_DIR itself, and a new
+build there is picked up once its manifest.json changes.
+
+A load that fails keeps serving the previous bundle.
+"""
+import json
+import logging
+import os
+import pickle
+import signal
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .metadata import MovieMetadata
+from .metrics import count, timed
+from .ranking import RankingPriors
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILES = ('movie_meta.npz', 'similarity.npy', 'similarity_scores.npy', 'signatures.npy', 'embeddings.npy',
+                  'tag_vectors.npz', 'movies.pkl', 'similarity.pkl', 'manifest.json')
+CURRENT_POINTER = 'CURRENT'
+
+
+class ArtifactBundle:
+    """
+    Immutable set of serving artifacts from one build. scores holds the
+    cosine score of each stored neighbour (None for builds made before
+    similarity_scores.npy); signatures are the per-movie vectors used by the
+    diversity step (None before signatures.npy); embeddings are the optional
+    memory-mapped SVD item vectors for online queries (utils.similar_to_rows);
+    priors are the re-ranking arrays (ranking.py).
+    """
+
+    __slots__ = ('metadata', 'similarity', 'scores', 'signatures', 'embeddings', 'priors', 'version', 'build_dir',
+                 'key', 'loaded_at')
+
+    def __init__(self, metadata, similarity, version, build_dir, key, scores=None, signatures=None, embeddings=None,
+                 priors=None):
+        for array in (similarity, scores, signatures, embeddings):
+            if array is not None:
+                array.setflags(write=False)
+        for name, value in (('metadata', metadata), ('similarity', similarity), ('scores', scores),
+                            ('signatures', signatures), ('embeddings', embeddings),
+                            ('priors', priors or RankingPriors(metadata)),
+                            ('version', version),
+                            ('build_dir', build_dir), ('key', key), ('loaded_at', time.time())):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ArtifactBundle is immutable')
+
+    @classmethod
+    def empty(cls, key=None):
+        return cls(MovieMetadata.empty(), np.zeros((0, 0), dtype=np.int32), None, None, key)
+
+    def __len__(self):
+        return len(self.metadata)
+
+
+def artifacts_root():
+    """
+    settings.ARTIFACTS_DIR wins if set, otherwise the repository root
+    (where generate_models.py writes) and then its artifacts/ folder.
+    """
+    configured = getattr(settings, 'ARTIFACTS_DIR', None)
+    if configured:
+        return str(configured)
+
+    base_dir = settings.BASE_DIR.parent # Recommendation_System root
+    for candidate in (base_dir, base_dir / 'artifacts'):
+        if any(os.path.exists(candidate / name) for name in (CURRENT_POINTER, 'movie_meta.npz', 'movies.pkl')):
+            return str(candidate)
+    return str(base_dir / 'artifacts')
+
+
+def current_build():
+    """Return (build_dir, version) of the build that should be served."""
+    root = artifacts_root()
+    try:
+        with open(os.path.join(root, CURRENT_POINTER)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        version = None
+    if version:
+        return os.path.join(root, version), version
+    return root, None
+
+
+def build_key(build_dir, version):
+    """
+    Cheap change-detection key: the published version, else the stats of
+    manifest.json, which generate_models.py replaces after every other file
+    of a build is in place (so a poll never picks up half a build). Only
+    builds without a manifest fall back to the stats of every file.
+    """
+    if version:
+        return ('version', version)
+    try:
+        st = os.stat(os.path.join(build_dir, 'manifest.json'))
+    except OSError:
+        pass
+    else:
+        return ('manifest', st.st_ino, st.st_mtime_ns, st.st_size)
+    stats = []
+    for name in ARTIFACT_FILES:
+        try:
+            st = os.stat(os.path.join(build_dir, name))
+        except OSError:
+            continue
+        stats.append((name, st.st_mtime_ns, st.st_size))
+    return ('files', tuple(stats))
+
+
+def build_files(build_dir):
+    """
+    (names of the artifact files that belong to the build, manifest or None).
+    With a manifest listing its files, only those count: anything else in
+    the folder is left over from an earlier build written to the same place.
+    """
+    try:
+        with open(os.path.join(build_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = None
+    if manifest is not None and 'files' in manifest:
+        listed = set(manifest['files'])
+        names = [name for name in ARTIFACT_FILES if name in listed or name == 'manifest.json']
+    else:
+        # Builds from before the manifest listed its files
+        names = list(ARTIFACT_FILES)
+    return [name for name in names if os.path.exists(os.path.join(build_dir, name))], manifest
+
+
+def load_bundle(build_dir, version=None, key=None):
+    """Load and validate one build. Raises on missing or inconsistent files."""
+    def path(name):
+        return os.path.join(build_dir, name)
+
+    files, manifest = build_files(build_dir)
+
+    if 'similarity.npy' in files:
+        similarity = np.load(path('similarity.npy'), allow_pickle=False)
+    else:
+        with open(path('similarity.pkl'), 'rb') as f:
+            similarity = np.asarray(pickle.load(f))
+
+    if 'movie_meta.npz' in files:
+        metadata = MovieMetadata.load(path('movie_meta.npz'))
+    else:
+        # Artifacts built before movie_meta.npz existed
+        with open(path('movies.pkl'), 'rb') as f:
+            metadata = MovieMetadata.from_frame(pickle.load(f))
+
+    if similarity.ndim != 2 or similarity.shape[0] != len(metadata):
+        raise ValueError(f"similarity has {similarity.shape[0]} rows but metadata has {len(metadata)} movies")
+    if similarity.size and similarity.max() >= len(metadata):
+        raise ValueError("similarity references rows outside the metadata")
+
+    scores = None
+    if 'similarity_scores.npy' in files:
+        scores = np.load(path('similarity_scores.npy'), allow_pickle=False)
+        if scores.shape != similarity.shape:
+            raise ValueError(f"similarity_scores has shape {scores.shape}, similarity has {similarity.shape}")
+
+    signatures = None
+    if 'signatures.npy' in files:
+        # float16 on disk; widened once here instead of on every request
+        signatures = np.load(path('signatures.npy'), allow_pickle=False).astype(np.float32)
+        if signatures.ndim != 2 or signatures.shape[0] != len(metadata):
+            raise ValueError(f"signatures has shape {signatures.shape} but metadata has {len(metadata)} movies")
+
+    embeddings = None
+    if 'embeddings.npy' in files:
+        # Memory-mapped: pages are shared between workers and read on demand
+        embeddings = np.load(path('embeddings.npy'), mmap_mode='r', allow_pickle=False)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(metadata):
+            raise ValueError(f"embeddings has shape {embeddings.shape} but metadata has {len(metadata)} movies")
+
+    if version is None and manifest is not None:
+        version = manifest.get('version')
+
+    return ArtifactBundle(metadata, similarity, version, build_dir, key, scores, signatures, embeddings)
+
+
+_BUNDLE = None
+_LOCK = threading.Lock()
+_next_check = 0.0
+_reload_requested = False
+
+
+def _refresh(force=False):
+    """Load the current build if it changed. Returns the bundle now being served."""
+    global _BUNDLE, _next_check, _reload_requested
+
+    # Only one thread loads; the others keep serving the old bundle meanwhile.
+    # With nothing to serve yet, wait for the loader instead.
+    if not _LOCK.acquire(blocking=_BUNDLE is None):
+        return _BUNDLE
+    try:
+        _reload_requested = False
+        interval = getattr(settings, 'ARTIFACTS_RELOAD_INTERVAL', None)
+        _next_check = time.monotonic() + interval if interval is not None else float('inf')
+
+        build_dir, version = current_build()
+        key = build_key(build_dir, version)
+        current = _BUNDLE
+        if current is not None and current.key == key and not force:
+            count('recommender_artifact_cache_total', result='unchanged')
+            return current
+
+        try:
+            with timed('artifact_load'):
+                bundle = load_bundle(build_dir, version, key)
+            count('recommender_artifact_cache_total', result='loaded')
+            logger.info("Loaded recommendation artifacts (version %s).", bundle.version or 'unversioned')
+        except Exception:
+            logger.exception("Error loading artifacts from %s", build_dir)
+            count('recommender_artifact_cache_total', result='failed')
+            if current is not None:
+                # Keep serving the previous build. Remember the failed key
+                # so we retry only when the files change again.
+                bundle = ArtifactBundle(current.metadata, current.similarity, current.version, current.build_dir, key,
+                                        current.scores, current.signatures, current.embeddings, current.priors)
+            else:
+                bundle = ArtifactBundle.empty(key)
+
+        _BUNDLE = bundle
+        return bundle
+    finally:
+        _LOCK.release()
+
+
+def get_bundle():
+    """The bundle to use for this request. Hold on to it, don't call again mid-request."""
+    bundle = _BUNDLE
+    if _reload_requested:
+        # SIGHUP: load even if the key is unchanged, e.g. to retry a build
+        # that failed to load for a reason that's since been fixed
+        return _refresh(force=True)
+    if bundle is None or time.monotonic() >= _next_check:
+        return _refresh()
+    count('recommender_artifact_cache_total', result='hit')
+    return bundle
+
+
+def reload_artifacts():
+    """Reload the current build now, even if it looks unchanged."""
+    return _refresh(force=True)
+
+
+def _request_reload(signum, frame):
+    # Don't load inside the signal handler, the next request does it
+    global _reload_requested
+    _reload_requested = True
+
+
+def install_reload_signal(signum=getattr(signal, 'SIGHUP', None)):
+    """
+    Reload artifacts when the worker process receives SIGHUP. Only possible
+    from the main thread, so this is called from wsgi.py/asgi.py, and from
+    gunicorn.conf.py's post_worker_init: under `gunicorn --preload` wsgi.py
+    runs in the master and each worker then resets SIGHUP to its default.
+    """
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, _request_reload)
+    return True
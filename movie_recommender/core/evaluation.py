@@ -0,0 +1,158 @@
+"""
+Offline quality and cost metrics for an artifact build, used by
+`manage.py evaluate_artifacts` to compare two builds side by side.
+
+All metrics are computed on the lists the site actually serves
+(utils.neighbour_rows), for every movie in the catalogue.
+"""
+import os
+import time
+
+import numpy as np
+
+from .artifacts import build_files, load_bundle
+from .utils import neighbour_rows
+
+
+def recommendation_matrix(bundle, k, recommend=neighbour_rows):
+    """(n, k) array of recommended rows per movie, padded with -1."""
+    n = len(bundle)
+    recs = np.full((n, k), -1, dtype=np.int64)
+    for idx in range(n):
+        rows = recommend(bundle, idx, k)
+        recs[idx, :len(rows)] = rows
+    return recs
+
+
+def _genre_masks(metadata):
+    """One uint64 bitmask of genres per movie (catalogues have ~20 genres)."""
+    if len(metadata.genre_names) == 0 or len(metadata.genre_names) > 64:
+        return None
+    bits = np.left_shift(np.uint64(1), metadata.genre_codes.astype(np.uint64))
+    masks = np.zeros(len(metadata), dtype=np.uint64)
+    rows = np.repeat(np.arange(len(metadata)), np.diff(metadata.genre_offsets))
+    np.bitwise_or.at(masks, rows, bits)
+    return masks
+
+
+def genre_coherence(metadata, recs):
+    """Share of recommendations sharing at least one genre with the source movie."""
+    masks = _genre_masks(metadata)
+    if masks is None:
+        return None
+    valid = recs >= 0
+    source = np.broadcast_to(masks[:, None], recs.shape)[valid]
+    target = masks[recs[valid]]
+    has_genres = source != 0
+    if not has_genres.any():
+        return None
+    return float(((source & target) != 0)[has_genres].mean())
+
+
+def popularity_bias(metadata, recs):
+    """How popular recommended movies are, relative to the catalogue."""
+    valid = recs >= 0
+    rec_rows = recs[valid]
+    # Percentile of each movie's popularity in the catalogue (0 = least, 1 = most popular)
+    order = np.argsort(metadata.popularity, kind='stable')
+    percentile = np.empty(len(metadata))
+    percentile[order] = np.arange(len(metadata)) / max(len(metadata) - 1, 1)
+    return {
+        'mean_popularity_percentile': float(percentile[rec_rows].mean()),
+        'median_vote_count': float(np.median(metadata.vote_count[rec_rows])),
+        'zero_vote_share': float((metadata.vote_count[rec_rows] == 0).mean()),
+        'mean_vote_average': float(metadata.vote_average[rec_rows].mean()),
+    }
+
+
+def coverage(recs, n):
+    """Catalogue coverage and how evenly recommendations are spread (Gini, 0 = even)."""
+    counts = np.bincount(recs[recs >= 0], minlength=n)
+    sorted_counts = np.sort(counts)
+    cum = np.cumsum(sorted_counts)
+    gini = 1 - 2 * (cum / cum[-1]).sum() / n + 1 / n if cum[-1] else 0.0
+    return {
+        'catalog_coverage': float((counts > 0).mean()),
+        'gini': float(gini),
+    }
+
+
+def list_diversity(bundle, recs):
+    """
+    How varied each list is: mean pairwise signature similarity within a list,
+    and the share of recommendations from the source movie's own director or
+    collection (sequels).
+    """
+    metadata = bundle.metadata
+    valid = recs >= 0
+    result = {}
+    if bundle.signatures is not None and recs.shape[1] > 1:
+        sig = bundle.signatures[np.where(valid, recs, 0)]
+        sig[~valid] = 0
+        gram = np.einsum('nid,njd->nij', sig, sig)
+        pairs = valid[:, :, None] & valid[:, None, :] & ~np.eye(recs.shape[1], dtype=bool)
+        result['intra_list_similarity'] = float(gram[pairs].mean()) if pairs.any() else None
+    else:
+        result['intra_list_similarity'] = None
+    for label, codes in (('director', metadata.director_code), ('collection', metadata.collection_code)):
+        source = np.broadcast_to(codes[:, None], recs.shape)[valid]
+        target = codes[recs[valid]]
+        known = source >= 0
+        result[f'same_{label}_share'] = float((source == target)[known].mean()) if known.any() else None
+    return result
+
+
+def neighbour_overlap(bundle_a, recs_a, bundle_b, recs_b):
+    """Mean overlap@k of the two builds' lists for movies present in both (matched by TMDB id)."""
+    ids_a, ids_b = bundle_a.metadata.movie_id, bundle_b.metadata.movie_id
+    overlaps = []
+    for row_a, tmdb_id in enumerate(ids_a.tolist()):
+        row_b = bundle_b.metadata.row_for_id(tmdb_id)
+        if row_b is None:
+            continue
+        a = set(ids_a[recs_a[row_a][recs_a[row_a] >= 0]].tolist())
+        b = set(ids_b[recs_b[row_b][recs_b[row_b] >= 0]].tolist())
+        if a or b:
+            overlaps.append(len(a & b) / max(len(a), len(b)))
+    return {
+        'shared_movies': len(overlaps),
+        'overlap_at_k': float(np.mean(overlaps)) if overlaps else None,
+    }
+
+
+def serve_cost(bundle, k, samples, seed=0, recommend=neighbour_rows):
+    """Latency of building one recommendation list (lookup + records), in seconds."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(bundle), samples)
+    timings = np.empty(samples)
+    for i, idx in enumerate(rows):
+        start = time.perf_counter()
+        bundle.metadata.records(recommend(bundle, idx, k))
+        timings[i] = time.perf_counter() - start
+    return {
+        'p50_s': float(np.percentile(timings, 50)),
+        'p99_s': float(np.percentile(timings, 99)),
+    }
+
+
+def build_cost(build_dir):
+    size = sum(os.path.getsize(os.path.join(build_dir, name)) for name in build_files(build_dir)[0])
+    start = time.perf_counter()
+    bundle = load_bundle(build_dir)
+    load_seconds = time.perf_counter() - start
+    return bundle, {'disk_mb': size / 1e6, 'load_seconds': load_seconds}
+
+
+def evaluate(bundle, k, samples=2000, recommend=neighbour_rows):
+    """Quality metrics and serve cost of one bundle. Returns (metrics, recs)."""
+    recs = recommendation_matrix(bundle, k, recommend)
+    metrics = {
+        'movies': len(bundle),
+        'genre_coherence': genre_coherence(bundle.metadata, recs),
+        **popularity_bias(bundle.metadata, recs),
+        **coverage(recs, len(bundle)),
+        **list_diversity(bundle, recs),
+    }
+    if len(bundle):
+        metrics.update({f'serve_{key}': value for key, value in serve_cost(bundle, k, samples, recommend=recommend).items()})
+    return metrics, recs
@@ -0,0 +1,115 @@
+import json
+import os
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.artifacts import artifacts_root
+from core.evaluation import build_cost, evaluate, neighbour_overlap
+from core.ranking import parse_weights
+from core.utils import neighbour_rows
+
+# Direction of improvement, for the +/- marks; popularity percentile is a trade-off, left unmarked
+HIGHER_IS_BETTER = {'genre_coherence', 'catalog_coverage', 'mean_vote_average'}
+LOWER_IS_BETTER = {'zero_vote_share', 'gini', 'intra_list_similarity', 'serve_p50_s', 'serve_p99_s', 'disk_mb', 'load_seconds', 'build_seconds'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the recommendation quality and cost of two artifact builds: overlap@k, genre coherence, '
+        'popularity bias, catalogue coverage, list diversity, build/load/serve cost.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='Build folder, or a version published with publish_artifacts')
+        parser.add_argument('candidate', help='Build folder, or a version published with publish_artifacts')
+        parser.add_argument('-k', type=int, default=5, help='Recommendations per movie (the site shows 5)')
+        parser.add_argument('--samples', type=int, default=2000, help='Lookups timed per build')
+        parser.add_argument('--json', dest='json_path', help='Also write the numbers to this JSON file')
+        for label in ('baseline', 'candidate'):
+            parser.add_argument(f'--{label}-weights', default='', metavar='NAME=VALUE,...',
+                                help=f'Re-ranking weights for the {label}, e.g. quality=0.5,diversity=0.3 '
+                                     '(default: settings.RECOMMENDATION_WEIGHTS)')
+
+    def resolve(self, name):
+        if os.path.isdir(name):
+            return name
+        published = os.path.join(artifacts_root(), name)
+        if os.path.isdir(published):
+            return published
+        raise CommandError(f'{name} is neither a folder nor a published version.')
+
+    def weights(self, text):
+        params = {}
+        for item in filter(None, (part.strip() for part in text.split(','))):
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Expected NAME=VALUE, got {item!r}.')
+            params[name.strip()] = value.strip()
+        return parse_weights(params)
+
+    def build_seconds(self, build_dir):
+        try:
+            with open(os.path.join(build_dir, 'manifest.json')) as f:
+                stages = json.load(f).get('build_seconds') or {}
+        except FileNotFoundError:
+            return None
+        return sum(stages.values()) if stages else None
+
+    def handle(self, *args, **options):
+        k = options['k']
+        results = {}
+        recs = {}
+        bundles = {}
+        for label in ('baseline', 'candidate'):
+            build_dir = self.resolve(options[label])
+            try:
+                bundle, cost = build_cost(build_dir)
+            except Exception as e:
+                raise CommandError(f'Could not load {build_dir}: {e}')
+            weights = self.weights(options[f'{label}_weights'])
+            self.stdout.write(f'Evaluating {label}: {build_dir} ({len(bundle)} movies), '
+                              f'weights {dict(weights._asdict())}...')
+            metrics, recs[label] = evaluate(bundle, k, options['samples'], partial(neighbour_rows, weights=weights))
+            metrics.update(cost, build_seconds=self.build_seconds(build_dir))
+            results[label] = metrics
+            bundles[label] = bundle
+
+        overlap = neighbour_overlap(bundles['baseline'], recs['baseline'], bundles['candidate'], recs['candidate'])
+
+        self.stdout.write('')
+        self.stdout.write(f"{'metric':<28} {'baseline':>14} {'candidate':>14} {'change':>10}")
+        for key in results['baseline']:
+            a, b = results['baseline'][key], results['candidate'][key]
+            self.stdout.write(f'{key:<28} {self.fmt(a):>14} {self.fmt(b):>14} {self.change(key, a, b):>10}')
+        self.stdout.write('')
+        self.stdout.write(f"overlap@{k} between builds: {self.fmt(overlap['overlap_at_k'])} "
+                          f"over {overlap['shared_movies']} shared movies")
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'k': k, 'overlap': overlap, **results}, f, indent=2)
+            self.stdout.write(f"Written to {options['json_path']}")
+
+    @staticmethod
+    def fmt(value):
+        if value is None:
+            return '-'
+        if isinstance(value, float):
+            return f'{value:.4g}'
+        return str(value)
+
+    def change(self, key, a, b):
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or key == 'movies':
+            return ''
+        if a == b:
+            return '='
+        if a:
+            text = f'{(b - a) / abs(a) * 100:+.0f}%'
+        else:
+            text = f'{b - a:+.3g}'
+        if key in LOWER_IS_BETTER:
+            return text + (' +' if b < a else ' -')
+        if key in HIGHER_IS_BETTER:
+            return text + (' +' if b > a else ' -')
+        return text
@@ -1,20 +1,37 @@
 import os
-import pandas as pd
+import sys
 import json
 import ast
-import numpy as np
 from django.core.management.base import BaseCommand
 from core.models import Movie
 from django.conf import settings
 
+# Only the columns the Movie rows are built from
+COLUMNS = ['id', 'title', 'overview', 'genres', 'popularity', 'release_date', 'vote_average', 'vote_count', 'poster_path']
+
 class Command(BaseCommand):
     help = 'Import all 45k movies from movies_metadata.csv'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--csv-engine', choices=['c', 'pyarrow'], default='c',
+                            help='pandas CSV parser; pyarrow is multithreaded if installed (default: c)')
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Parse the CSV even if .build_cache/ has a binary copy of it")
+        parser.add_argument('--data-dir', help='Folder with movies_metadata.csv (default: data/ in the repository root)')
+        parser.add_argument('--cache-dir', help='Binary CSV cache folder (default: .build_cache/ in the repository root)')
+
     def handle(self, *args, **kwargs):
         # Path to data
         base_dir = settings.BASE_DIR
         project_root = base_dir.parent 
-        movies_csv = os.path.join(project_root, 'data', 'movies_metadata.csv')
+        movies_csv = os.path.join(kwargs['data_dir'] or os.path.join(project_root, 'data'), 'movies_metadata.csv')
+
+        # Imported here so web workers and other commands don't pay for pandas;
+        # tmdb_data lives next to generate_models.py, which shares it
+        if str(project_root) not in sys.path:
+            sys.path.insert(0, str(project_root))
+        import pandas as pd
+        import tmdb_data
 
         self.stdout.write(f"Looking for data at: {movies_csv}")
 
@@ -22,18 +39,11 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR('Movies CSV not found!'))
             return
 
-        # Load Data
+        # Load Data: rows with bad IDs or no release date are dropped, numeric columns are floats
         self.stdout.write("Loading CSV...")
-        movies = pd.read_csv(movies_csv, low_memory=False)
-        
-        # Clean Data (Logic from generate_models.py)
-        # Drop rows with bad IDs
-        movies['id'] = pd.to_numeric(movies['id'], errors='coerce')
-        movies = movies.dropna(subset=['id'])
-        movies['id'] = movies['id'].astype(int)
-        
-        # Drop rows with no release date (optional, but good for quality)
-        movies = movies[movies['release_date'].notna()]
+        cache_dir = None if kwargs['no_cache'] else kwargs['cache_dir'] or os.path.join(project_root, '.build_cache')
+        movies = tmdb_data.read_movies(os.path.dirname(movies_csv), columns=COLUMNS,
+                                       engine=kwargs['csv_engine'], cache_dir=cache_dir)
 
         self.stdout.write(f"Found {len(movies)} valid movies. Starting import...")
 
@@ -60,15 +70,15 @@ class Command(BaseCommand):
         batch_size = 1000
         batch = []
         
-        for index, row in movies.iterrows():
-            tmdb_id = row['id']
+        for row in movies.itertuples(index=False):
+            tmdb_id = row.id
             
             if tmdb_id in existing_ids:
                 continue
 
             try:
                 # Parse Genres
-                raw_genres = parse_json_field(row['genres'])
+                raw_genres = parse_json_field(row.genres)
                 genre_names = [g['name'] for g in raw_genres if isinstance(g, dict) and 'name' in g]
                 
                 # Parse Keywords (optional, stored if needed)
@@ -76,21 +86,21 @@ class Command(BaseCommand):
                 # keyword_names = [k['name'] for k in raw_keywords]
 
                 movie = Movie(
-                    title=str(row['title']),
-                    overview=str(row['overview']) if pd.notna(row['overview']) else '',
+                    title=str(row.title),
+                    overview=str(row.overview) if pd.notna(row.overview) else '',
                     tmdb_id=tmdb_id,
-                    popularity=float(row['popularity']) if pd.notna(row['popularity']) else 0.0,
-                    vote_average=float(row['vote_average']) if pd.notna(row['vote_average']) else 0.0,
-                    vote_count=int(row['vote_count']) if pd.notna(row['vote_count']) else 0,
+                    popularity=float(row.popularity) if pd.notna(row.popularity) else 0.0,
+                    vote_average=float(row.vote_average) if pd.notna(row.vote_average) else 0.0,
+                    vote_count=int(row.vote_count) if pd.notna(row.vote_count) else 0,
                     genres=json.dumps(genre_names),
                     # keywords=json.dumps(keyword_names), # Model has this field? Yes.
-                    release_date=row['release_date'] if pd.notna(row['release_date']) else None
+                    release_date=row.release_date if pd.notna(row.release_date) else None
                 )
                 
                 # Handling Poster Path (not in metadata csv usually, unless joined)
                 # movies_metadata.csv has 'poster_path'
-                if pd.notna(row.get('poster_path')):
-                    movie.poster_path = row['poster_path']
+                if pd.notna(row.poster_path):
+                    movie.poster_path = row.poster_path
 
                 batch.append(movie)
                 existing_ids.add(tmdb_id)
@@ -104,7 +114,7 @@ class Command(BaseCommand):
                     batch = []
 
             except Exception as e:
-                # self.stdout.write(self.style.WARNING(f"Error preparing row {index}: {e}"))
+                # self.stdout.write(self.style.WARNING(f"Error preparing movie {tmdb_id}: {e}"))
                 continue
         
         # Final batch
@@ -1,5 +1,4 @@
 import os
-import pandas as pd
 import json
 import ast
 from django.core.management.base import BaseCommand
@@ -10,6 +9,9 @@ class Command(BaseCommand):
     help = 'Import movies from TMDB CSV files'
 
     def handle(self, *args, **kwargs):
+        # Imported here so web workers and other commands don't pay for pandas
+        import pandas as pd
+
         # Use BASE_DIR from settings which points to the Django project root (where manage.py is)
         # Data is in the parent directory of the Django project
         base_dir = settings.BASE_DIR
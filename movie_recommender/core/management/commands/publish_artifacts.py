@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.artifacts import CURRENT_POINTER, artifacts_root, build_files, load_bundle
+
+
+class Command(BaseCommand):
+    help = (
+        'Publish a generate_models.py build as a new artifact version and make it current. '
+        'Running web workers pick it up within ARTIFACTS_RELOAD_INTERVAL seconds (or on SIGHUP).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', help='Folder with the built artifacts (movie_meta.npz, similarity.npy, ...)')
+        parser.add_argument('--name', help='Version name for the build (default: the version in manifest.json)')
+        parser.add_argument('--activate', metavar='VERSION', help='Make an already published version current (rollback)')
+
+    def handle(self, *args, **options):
+        root = artifacts_root()
+
+        if options['activate']:
+            version = options['activate']
+            self.validate(os.path.join(root, version), version)
+            self.point_current(root, version)
+            return
+
+        source = options['source']
+        if not source:
+            raise CommandError('Give a build folder to publish, or --activate VERSION.')
+        if not os.path.isdir(source):
+            raise CommandError(f'{source} is not a folder.')
+
+        version = options['name'] or self.manifest_version(source)
+        if not version:
+            raise CommandError('No manifest.json version in the build, pass --name.')
+        if os.sep in version or version.startswith('.') or version == CURRENT_POINTER:
+            raise CommandError(f'Invalid version name: {version}')
+
+        target = os.path.join(root, version)
+        if os.path.exists(target):
+            raise CommandError(f'Version {version} is already published at {target}.')
+
+        # Copy next to the target and rename, so workers never see a half-copied build
+        os.makedirs(root, exist_ok=True)
+        staging = os.path.join(root, f'.{version}.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        # Only the files of this build, not leftovers of an earlier one in the same folder
+        for name in build_files(source)[0]:
+            shutil.copy2(os.path.join(source, name), os.path.join(staging, name))
+        try:
+            self.validate(staging, version)
+        except CommandError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        os.replace(staging, target)
+
+        self.point_current(root, version)
+
+    def manifest_version(self, source):
+        try:
+            with open(os.path.join(source, 'manifest.json')) as f:
+                return json.load(f).get('version')
+        except FileNotFoundError:
+            return None
+
+    def validate(self, build_dir, version):
+        try:
+            bundle = load_bundle(build_dir, version)
+        except Exception as e:
+            raise CommandError(f'Build {version} failed to load, not publishing: {e}')
+        self.stdout.write(f'Build {version} OK ({len(bundle)} movies).')
+
+    def point_current(self, root, version):
+        pointer = os.path.join(root, CURRENT_POINTER)
+        tmp = pointer + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp, pointer)
+        self.stdout.write(self.style.SUCCESS(f'{version} is now the current artifact version in {root}.'))
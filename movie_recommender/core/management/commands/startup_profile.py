@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Boots a web worker the way gunicorn does, then loads the artifacts.
+# Runs in a fresh interpreter so nothing this command imported skews it.
+BOOT_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from movie_recommender.wsgi import application
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver(settings.ROOT_URLCONF).url_patterns  # urls -> views -> utils
+t1 = time.perf_counter()
+from core import utils
+utils.load_artifacts()
+t2 = time.perf_counter()
+print(json.dumps({
+    'boot': t1 - t0,
+    'artifacts': t2 - t1,
+    'movies': len(utils.get_metadata()),
+    'heavy': [m for m in %r if m in sys.modules],
+}))
+"""
+
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'nltk')
+
+
+def parse_importtime(stderr):
+    """
+    Sum -X importtime self times per top-level package.
+    Returns ({package: seconds}, total_seconds).
+    """
+    per_package = defaultdict(float)
+    total = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, _cumulative, name = line[len('import time:'):].split('|')
+            self_s = int(self_us) / 1e6
+        except ValueError:
+            continue # header line
+        per_package[name.strip().split('.')[0]] += self_s
+        total += self_s
+    return dict(per_package), total
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import time and artifact load time for a web worker boot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Number of packages to list')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'movie_recommender.settings'))
+        if settings.ARTIFACTS_DIR:
+            env['ARTIFACTS_DIR'] = str(settings.ARTIFACTS_DIR)
+
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT % (HEAVY_MODULES,)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"Worker boot failed:\n{proc.stderr[-2000:]}")
+
+        # The boot script prints its report as the last stdout line
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        per_package, import_total = parse_importtime(proc.stderr)
+
+        self.stdout.write(f"Imports (self time, top {options['top']} packages):")
+        ranked = sorted(per_package.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in ranked[:options['top']]:
+            self.stdout.write(f"  {name:<30} {seconds * 1000:8.1f} ms")
+        self.stdout.write(f"  {'total':<30} {import_total * 1000:8.1f} ms")
+
+        self.stdout.write(f"Worker boot (wsgi + urlconf): {report['boot'] * 1000:.1f} ms")
+        self.stdout.write(f"Artifact load: {report['artifacts'] * 1000:.1f} ms ({report['movies']} movies)")
+
+        if report['heavy']:
+            self.stdout.write(self.style.WARNING(f"Heavy modules on the serving path: {', '.join(report['heavy'])}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No heavy modules (pandas/sklearn/scipy/nltk) on the serving path."))
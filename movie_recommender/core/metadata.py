@@ -0,0 +1,231 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Lightweight row handed to templates. It carries both 'tmdb_id' (like the
+# Movie model) and 'movie_id' (like the old recommendation dicts) so the list
+# templates render it without a DB object.
+MovieRecord = namedtuple(
+    'MovieRecord',
+    ['tmdb_id', 'movie_id', 'title', 'year', 'vote_average', 'vote_count', 'popularity', 'poster_path'],
+)
+
+
+class StringTable:
+    """
+    Immutable list of strings kept as one NUL-joined str plus start offsets,
+    instead of one Python object per row.
+    """
+
+    __slots__ = ('_text', '_starts')
+
+    def __init__(self, values):
+        values = [str(v).replace('\0', '') for v in values]
+        self._text = '\0'.join(values) + '\0'
+        starts = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(v) + 1 for v in values], out=starts[1:])
+        self._starts = starts
+
+    @classmethod
+    def from_bytes(cls, arr, count):
+        """Inverse of generate_models.build_metadata's string_table()."""
+        if count == 0:
+            return cls([])
+        return cls(bytes(arr).decode('utf-8').split('\0'))
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    def __getitem__(self, row):
+        return self._text[self._starts[row]:self._starts[row + 1] - 1]
+
+    def __iter__(self):
+        return iter(self._text[:-1].split('\0')) if len(self) else iter(())
+
+    def find_rows(self, needle, limit=None):
+        """Rows containing needle as a substring, in row order."""
+        rows = []
+        if not needle or '\0' in needle:
+            return rows
+        text, starts = self._text, self._starts
+        pos = text.find(needle)
+        while pos != -1:
+            row = int(np.searchsorted(starts, pos, side='right')) - 1
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                break
+            # One hit per row: continue from the start of the next row
+            pos = text.find(needle, starts[row + 1])
+        return rows
+
+
+class MovieMetadata:
+    """
+    Struct-of-arrays view of the movies in the recommendation artifacts.
+    Row i matches row i of the similarity matrix, so list pages can be
+    rendered straight from the artifacts without touching the database.
+    Strings live in interned StringTables and genres/languages are small
+    integer codes, so serving never needs pandas.
+    """
+
+    __slots__ = (
+        'movie_id', 'title', 'year', 'vote_average', 'vote_count', 'popularity', 'poster_path',
+        'genre_offsets', 'genre_codes', 'genre_names', 'language_code', 'language_names',
+        'director_code', 'collection_code', '_title_lower', '_row_by_id', '_row_by_title', '_genre_row',
+    )
+
+    def __init__(self, movie_id, title, year, vote_average, vote_count, popularity, poster_path,
+                 genre_offsets=None, genre_codes=(), genre_names=(), language_code=None, language_names=(),
+                 director_code=None, collection_code=None):
+        self.movie_id = np.asarray(movie_id, dtype=np.int32)
+        n = len(self.movie_id)
+        self.title = title if isinstance(title, StringTable) else StringTable(title)
+        self.year = np.asarray(year, dtype=np.int16)
+        self.vote_average = np.asarray(vote_average, dtype=np.float32)
+        self.vote_count = np.asarray(vote_count, dtype=np.int32)
+        self.popularity = np.asarray(popularity, dtype=np.float32)
+        self.poster_path = poster_path if isinstance(poster_path, StringTable) else StringTable(poster_path)
+
+        # Genres as CSR: codes of row i are genre_codes[genre_offsets[i]:genre_offsets[i + 1]]
+        if genre_offsets is None:
+            genre_offsets = np.zeros(n + 1)
+        self.genre_offsets = np.asarray(genre_offsets, dtype=np.int32)
+        self.genre_codes = np.asarray(genre_codes, dtype=np.int16)
+        self.genre_names = genre_names if isinstance(genre_names, StringTable) else StringTable(genre_names)
+        self._genre_row = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.genre_offsets))
+
+        if language_code is None:
+            language_code = np.full(n, -1)
+        self.language_code = np.asarray(language_code, dtype=np.int16)
+        self.language_names = language_names if isinstance(language_names, StringTable) else StringTable(language_names)
+
+        # Director and collection (franchise) as opaque codes, -1 when unknown.
+        # Only compared for equality, by the diversity step in ranking.py.
+        self.director_code = np.asarray(np.full(n, -1) if director_code is None else director_code, dtype=np.int32)
+        self.collection_code = np.asarray(np.full(n, -1) if collection_code is None else collection_code, dtype=np.int32)
+
+        # Lookups. First occurrence wins, matching the old DataFrame lookups.
+        titles_lower = [t.lower() for t in self.title]
+        self._title_lower = StringTable(titles_lower)
+        row_by_id = {}
+        for row, tmdb_id in enumerate(self.movie_id.tolist()):
+            row_by_id.setdefault(tmdb_id, row)
+        self._row_by_id = row_by_id
+        row_by_title = {}
+        for row, title in enumerate(titles_lower):
+            row_by_title.setdefault(title, row)
+        self._row_by_title = row_by_title
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [], [])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            count = len(data['movie_id'])
+            extra = {}
+            if 'genre_codes' in data:
+                extra.update(
+                    genre_offsets=data['genre_offsets'],
+                    genre_codes=data['genre_codes'],
+                    genre_names=StringTable.from_bytes(data['genre_names'], int(data['genre_count'])),
+                    language_code=data['language_code'],
+                    language_names=StringTable.from_bytes(data['language_names'], int(data['language_count'])),
+                )
+            if 'director_code' in data:
+                extra.update(director_code=data['director_code'], collection_code=data['collection_code'])
+            return cls(
+                movie_id=data['movie_id'],
+                title=StringTable.from_bytes(data['title'], count),
+                year=data['year'],
+                vote_average=data['vote_average'],
+                vote_count=data['vote_count'],
+                popularity=data['popularity'],
+                poster_path=StringTable.from_bytes(data['poster_path'], count),
+                **extra,
+            )
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build from a legacy movies.pkl DataFrame (no movie_meta.npz shipped).
+        Those frames carry no genre or language columns, so genre and language
+        search return nothing until the artifacts are rebuilt.
+        """
+        import pandas as pd
+
+        n = len(df)
+
+        def numeric(column):
+            if column not in df:
+                return np.zeros(n)
+            return pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy()
+
+        if 'release_date' in df:
+            year = pd.to_datetime(df['release_date'], errors='coerce').dt.year.fillna(0).to_numpy()
+        else:
+            year = np.zeros(n)
+        posters = df['poster_path'].fillna('').astype(str) if 'poster_path' in df else [''] * n
+
+        return cls(
+            movie_id=df['movie_id'].to_numpy(),
+            title=df['title'].astype(str),
+            year=year,
+            vote_average=numeric('vote_average'),
+            vote_count=numeric('vote_count'),
+            popularity=numeric('popularity'),
+            poster_path=posters,
+        )
+
+    def __len__(self):
+        return len(self.movie_id)
+
+    def row_for_id(self, tmdb_id):
+        return self._row_by_id.get(int(tmdb_id))
+
+    def row_for_title(self, title):
+        """Case-insensitive exact title lookup."""
+        return self._row_by_title.get(str(title).lower())
+
+    def search_title(self, query, limit=None):
+        return self._title_lower.find_rows(str(query).lower(), limit)
+
+    def search_language(self, query, limit=None):
+        query = str(query).lower()
+        codes = [code for code, name in enumerate(self.language_names) if name.lower() == query]
+        if not codes:
+            return []
+        rows = np.flatnonzero(np.isin(self.language_code, codes))
+        return rows[:limit].tolist()
+
+    def search_genre(self, query, limit=None):
+        query = str(query).lower()
+        if not query:
+            return []
+        codes = [code for code, name in enumerate(self.genre_names) if query in name.lower()]
+        if not codes:
+            return []
+        rows = np.unique(self._genre_row[np.isin(self.genre_codes, codes)])
+        return rows[:limit].tolist()
+
+    def genres(self, row):
+        start, end = self.genre_offsets[row], self.genre_offsets[row + 1]
+        return [self.genre_names[code] for code in self.genre_codes[start:end]]
+
+    def record(self, row):
+        row = int(row)
+        tmdb_id = int(self.movie_id[row])
+        return MovieRecord(
+            tmdb_id=tmdb_id,
+            movie_id=tmdb_id,
+            title=self.title[row],
+            year=int(self.year[row]) or None,
+            vote_average=round(float(self.vote_average[row]), 1),
+            vote_count=int(self.vote_count[row]),
+            popularity=float(self.popularity[row]),
+            poster_path=self.poster_path[row] or None,
+        )
+
+    def records(self, rows):
+        return [self.record(row) for row in rows]
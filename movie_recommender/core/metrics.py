@@ -0,0 +1,204 @@
+"""
+In-process latency histograms and counters for the recommendation path,
+exposed in Prometheus text format by views.metrics.
+
+Metrics are per process: with several uvicorn/gunicorn workers each one
+reports its own numbers.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+# Seconds, 1-2.5-5 steps from 1us to 10s
+LATENCY_BUCKETS = tuple(m * 10.0 ** e for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated within buckets."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def histogram(self, name, **labels):
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), h in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, n in zip(self.bucket_labels(h.buckets), h.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {h.sum:.9g}')
+            lines.append(f'{name}_count{_labels(labels)} {h.count}')
+
+        # Precomputed percentiles, so p50/p99 per stage are readable without a Prometheus server
+        for (name, labels), h in histograms:
+            quantile_name = f'{name}_quantile'
+            if quantile_name not in typed:
+                typed.add(quantile_name)
+                lines.append(f'# TYPE {quantile_name} gauge')
+            for q in QUANTILES:
+                lines.append(f'{quantile_name}{_labels(labels, quantile=q)} {h.quantile(q):.9g}')
+
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def bucket_labels(buckets):
+        return [f'{b:g}' for b in buckets] + ['+Inf']
+
+
+def _labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ''
+    body = ','.join(f'{k}="{str(v)}"' for k, v in items)
+    return '{' + body + '}'
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of a block under recommender_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe('recommender_stage_seconds', {'stage': stage}, time.perf_counter() - start)
+
+
+def count(name, **labels):
+    REGISTRY.inc(name, labels)
+
+
+# Query counter of the view being run. Async views query from the ORM's
+# worker threads, which run in a copy of the request's context, so a context
+# variable (not a wrapper on the view's own connection) sees their queries.
+_view_queries = ContextVar('view_queries', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    queries = _view_queries.get()
+    if queries is not None:
+        queries[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection, **kwargs):
+    # First in the list, so `with connection.execute_wrapper(...)` blocks
+    # elsewhere still pop their own wrapper
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_query)
+
+
+connection_created.connect(_install_query_counter)
+
+
+@contextmanager
+def _view_timer(view_name):
+    queries = [0]
+    token = _view_queries.set(queries)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _view_queries.reset(token)
+        labels = {'view': view_name}
+        REGISTRY.observe('recommender_view_seconds', labels, time.perf_counter() - start)
+        REGISTRY.observe('recommender_view_db_queries', labels, queries[0], QUERY_COUNT_BUCKETS)
+
+
+def instrument_view(view_name):
+    """Time a view, sync or async, and count the DB queries it runs."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                with _view_timer(view_name):
+                    return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                # This thread's connection may predate the connection_created hook
+                _install_query_counter(connection)
+                with _view_timer(view_name):
+                    return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
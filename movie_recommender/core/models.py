@@ -17,5 +17,10 @@ class Movie(models.Model):
     
     release_date = models.DateField(blank=True, null=True)
 
+    @property
+    def year(self):
+        # Shared with MovieRecord so list templates render either
+        return self.release_date.year if self.release_date else None
+
     def __str__(self):
         return self.title
@@ -0,0 +1,157 @@
+"""
+Serve-time re-ranking of the stored content neighbours.
+
+Each movie's top-K candidates (similarity.npy, with cosine scores in
+similarity_scores.npy) are re-scored as
+
+    similarity * cosine + quality * weighted_rating + recency * 2 ** (-age / half_life)
+
+where weighted_rating is the IMDB-style prior v / (v + m) * R + m / (v + m) * C
+scaled to 0..1, precomputed once per bundle. Only K values per request are
+touched, so this costs microseconds.
+
+Optionally the final k are then picked for diversity: greedy maximal marginal
+relevance (diversity > 0) using the build's signature vectors as pairwise
+similarity, and/or at most max_per_director / max_per_collection films from
+one director or collection (0 = no cap).
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+
+Weights = namedtuple('Weights', [
+    'similarity', 'quality', 'recency', 'half_life', 'diversity', 'max_per_director', 'max_per_collection',
+])
+UNWEIGHTED = Weights(1.0, 0.0, 0.0, 15.0, 0.0, 0, 0)
+
+MAX_WEIGHT = 10.0
+# (low, high) accepted per field, MAX_WEIGHT-bounded otherwise
+LIMITS = {'half_life': (0.5, 200.0), 'diversity': (0.0, 1.0), 'max_per_director': (0, 50), 'max_per_collection': (0, 50)}
+CAPS = ('max_per_director', 'max_per_collection')
+
+
+def default_weights():
+    """settings.RECOMMENDATION_WEIGHTS, falling back to pure content similarity."""
+    configured = getattr(settings, 'RECOMMENDATION_WEIGHTS', None) or {}
+    return Weights(**{**UNWEIGHTED._asdict(), **configured})
+
+
+def parse_weights(params):
+    """
+    Default weights overridden by any valid values in params, e.g. request.GET
+    for /movie/603/?quality=1&recency=0.5. Invalid values are ignored.
+    """
+    weights = default_weights()._asdict()
+    for name in Weights._fields:
+        raw = params.get(name)
+        if raw in (None, ''):
+            continue
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            continue
+        if not np.isfinite(value):
+            continue
+        low, high = LIMITS.get(name, (0.0, MAX_WEIGHT))
+        value = min(max(value, low), high)
+        weights[name] = int(value) if name in CAPS else value
+    return Weights(**weights)
+
+
+def weighted_rating(vote_average, vote_count, quantile=0.9):
+    """
+    IMDB weighted rating scaled to 0..1: movies with few votes are pulled
+    towards the catalogue mean C; m is the vote count at the given quantile.
+    """
+    vote_average = np.asarray(vote_average, dtype=np.float64)
+    vote_count = np.asarray(vote_count, dtype=np.float64)
+    if not len(vote_count):
+        return np.zeros(0, dtype=np.float32)
+    voted = vote_count > 0
+    c = vote_average[voted].mean() if voted.any() else 0.0
+    m = max(np.quantile(vote_count, quantile), 1.0)
+    wr = vote_count / (vote_count + m) * vote_average + m / (vote_count + m) * c
+    return (wr / 10.0).astype(np.float32)
+
+
+class RankingPriors:
+    """Per-bundle arrays the re-ranker needs, computed once at load."""
+
+    __slots__ = ('quality', 'age', 'director', 'collection')
+
+    def __init__(self, metadata, reference_year=None):
+        self.quality = weighted_rating(metadata.vote_average, metadata.vote_count)
+        reference_year = reference_year or date.today().year
+        years = metadata.year.astype(np.float32)
+        # Unknown release year counts as old
+        self.age = np.where(years > 0, np.maximum(reference_year - years, 0), 200).astype(np.float32)
+        self.director = metadata.director_code
+        self.collection = metadata.collection_code
+
+
+def rerank(priors, candidates, scores, weights, k, signatures=None):
+    """
+    Top k of candidates (rows) by blended score; ties keep the content order.
+    signatures (n, d) are only needed for MMR (weights.diversity).
+    """
+    blended = weights.similarity * scores.astype(np.float32)
+    if weights.quality:
+        blended = blended + weights.quality * priors.quality[candidates]
+    if weights.recency:
+        blended = blended + weights.recency * np.exp2(-priors.age[candidates] / weights.half_life)
+    if not diversifies(weights):
+        order = np.argsort(-blended, kind='stable')[:k]
+        return candidates[order]
+    return diversify(priors, candidates, blended, weights, k, signatures)
+
+
+def diversify(priors, candidates, relevance, weights, k, signatures=None):
+    """
+    Greedy selection of k candidates: each step takes the best
+    (1 - diversity) * relevance - diversity * max similarity to those already
+    picked, skipping directors/collections that reached their cap. If the caps
+    leave nothing to pick, the best remaining candidates fill the list.
+    """
+    m = len(candidates)
+    relevance = relevance / max(float(np.abs(relevance).max()), 1e-6) if m else relevance
+    pairwise = None
+    if weights.diversity and signatures is not None:
+        sig = signatures[candidates]
+        pairwise = sig @ sig.T
+    groups = [(codes[candidates], cap) for codes, cap in ((priors.director, weights.max_per_director),
+                                                          (priors.collection, weights.max_per_collection)) if cap]
+
+    # Taken candidates drop out; capped ones sink below every other candidate
+    # but stay pickable, so the list is still filled when the caps bind.
+    penalty = np.zeros(m, dtype=np.float32)
+    relevance = (1 - weights.diversity) * relevance if pairwise is not None else relevance
+    max_sim = np.zeros(m, dtype=np.float32)
+    picked = []
+    counts = {}
+    for _ in range(min(k, m)):
+        score = relevance + penalty
+        if pairwise is not None:
+            score -= weights.diversity * max_sim
+        j = int(np.argmax(score))
+        picked.append(j)
+        penalty[j] = -np.inf
+        if pairwise is not None:
+            np.maximum(max_sim, pairwise[j], out=max_sim)
+        for g, (codes, cap) in enumerate(groups):
+            code = int(codes[j])
+            if code < 0:
+                continue
+            seen = counts[g, code] = counts.get((g, code), 0) + 1
+            if seen == cap:
+                penalty[codes == code] -= 1e6
+    return candidates[picked]
+
+
+def reranks(weights):
+    return bool(weights.quality or weights.recency or diversifies(weights))
+
+
+def diversifies(weights):
+    return bool(weights.diversity or weights.max_per_director or weights.max_per_collection)
@@ -1,3 +1,771 @@
-from django.test import TestCase
+import argparse
+import importlib.util
+import json
+import os
+import pickle
+import shutil
+import signal
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import artifacts, ranking, utils, views
+from core.evaluation import evaluate, neighbour_overlap
+from core.metadata import StringTable
+from core.metrics import REGISTRY, Histogram
+from core.models import Movie
+
+# The model builder lives at the repository root, next to the Django project
+sys.path.insert(0, str(settings.BASE_DIR.parent))
+import generate_models  # noqa: E402
+import tmdb_data  # noqa: E402
+
+COLUMNS = ['movie_id', 'title', 'tags', 'release_date', 'vote_average', 'vote_count', 'popularity', 'poster_path', 'original_language', 'genre_names', 'director', 'collection_id']
+# Toy Story and Toy Story 2 share a collection; Lasseter directed both and Cars
+MOVIES = [
+    (10, 'Toy Story', 'toy cowboy animation comedy', '1995-10-30', 7.7, 5415, 21.9, '/toy.jpg', 'en', ['Animation', 'Comedy'], 'John Lasseter', 10194),
+    (20, 'Toy Story 2', 'toy cowboy animation sequel', '1999-10-30', 7.3, 3914, 17.5, '/toy2.jpg', 'en', ['Animation', 'Comedy'], 'John Lasseter', 10194),
+    (30, 'Jumanji', 'board game jungle adventure', '1995-12-15', 6.9, 2413, 17.0, '', 'en', ['Adventure', 'Fantasy'], 'Joe Johnston', 0),
+    (40, 'Heat', 'heist crime thriller', '1995-12-15', 7.7, 1886, 17.9, '/heat.jpg', 'en', ['Crime', 'Thriller'], 'Michael Mann', 0),
+    (50, 'Cars', 'race car animation comedy', '2006-06-08', 6.6, 3315, 9.1, '/cars.jpg', 'en', ['Animation'], 'John Lasseter', 0),
+    (60, 'Up', 'balloon house animation adventure', '2009-05-13', 7.8, 7048, 19.3, '/up.jpg', 'fr', ['Animation', 'Adventure'], 'Pete Docter', 0),
+]
+
+# Row 0 is always the movie itself, as generate_models.py writes it
+SIMILARITY = np.array([
+    [0, 1, 4, 5, 2, 3],
+    [1, 0, 4, 5, 2, 3],
+    [2, 5, 0, 1, 4, 3],
+    [3, 2, 0, 1, 4, 5],
+    [4, 0, 1, 5, 2, 3],
+    [5, 0, 4, 1, 2, 3],
+], dtype=np.int32)
+# Falling with rank, like real cosine scores; the same for every row
+SCORES = np.tile(np.array([1.0, 0.8, 0.65, 0.5, 0.35, 0.2], dtype=np.float16), (len(MOVIES), 1))
+
+
+def string_table(values):
+    return np.frombuffer('\0'.join(values).encode('utf-8'), dtype=np.uint8)
+
+
+def write_artifacts(directory, similarity=SIMILARITY, scores=SCORES, **optional):
+    """
+    Build the fixture catalogue with generate_models.py's own build_metadata
+    and save_artifacts, so the tests load exactly what the builder writes.
+    optional: signatures, vectors, embeddings, as save_artifacts takes them.
+    """
+    df = pd.DataFrame(MOVIES, columns=COLUMNS)
+    with redirect_stdout(StringIO()):
+        generate_models.save_artifacts(df, (similarity, scores), generate_models.build_metadata(df), directory,
+                                       **optional)
+
+
+def crew(*members):
+    return repr([{'department': department, 'job': job, 'name': name} for department, job, name in members])
+
+
+def names(*values):
+    return repr([{'id': i, 'name': name} for i, name in enumerate(values)])
+
+
+def write_tmdb_csvs(directory, extra_movies=()):
+    """
+    A tiny "The Movies Dataset" (movies_metadata.csv, credits.csv,
+    keywords.csv) with the quirks of the real files: a shifted row with a
+    date for an id, a movie without a release date, missing numbers, ids
+    repeated in credits and keywords, and columns nobody reads.
+    """
+    os.makedirs(directory, exist_ok=True)
+    movies = [
+        ('False', "{'id': 10194, 'name': 'Toy Story Collection'}", '30000000', names('Animation', 'Comedy'), '862',
+         'en', 'Led by Woody, toys live happily in a room.', '21.94', '/toy.jpg', '1995-10-30', 'Toy Story', '7.7', '5415'),
+        ('False', '', '65000000', names('Adventure', 'Fantasy'), '8844', 'en',
+         'Siblings find a magical board game in the attic.', '17.01', '/jumanji.jpg', '1995-12-15', 'Jumanji', '6.9', '2413'),
+        ('False', '', '60000000', names('Action', 'Crime'), '949', 'en',
+         'A group of professional bank robbers in Los Angeles.', '17.92', '/heat.jpg', '1995-12-15', 'Heat', '7.7', '1886'),
+        ('False', '', '16000000', names('Comedy', 'Drama'), '31357', 'en',
+         'Four women wait for the right man.', '3.86', '', '1995-12-22', 'Waiting to Exhale', '6.1', ''),
+        # Shifted row, as in the real file
+        ('- Written by Ørnås', '0.065736', '/ff9q.jpg', '[]', '1997-08-20', '0', 'en', '', 'Beware Of Frost Bites', '', '', '', ''),
+        ('False', '', '0', names('Drama'), '100', 'en', 'Never released.', '1.0', '', '', 'Undated', '5.0', '3'),
+        *extra_movies,
+    ]
+    pd.DataFrame(movies, columns=[
+        'adult', 'belongs_to_collection', 'budget', 'genres', 'id', 'original_language', 'overview', 'popularity',
+        'poster_path', 'release_date', 'title', 'vote_average', 'vote_count',
+    ]).to_csv(os.path.join(directory, 'movies_metadata.csv'), index=False)
+
+    cast = repr([{'cast_id': 14, 'character': 'Woody', 'name': 'Tom Hanks', 'order': 0},
+                 {'cast_id': 15, 'character': 'Buzz', 'name': 'Tim Allen', 'order': 1}])
+    pd.DataFrame([
+        # Several Directing jobs: the first 'Director' is the one the builder keeps
+        (cast, crew(('Directing', 'Co-Director', 'Lee Unkrich'), ('Writing', 'Screenplay', 'Joss Whedon'),
+                    ('Directing', 'Director', 'John Lasseter'), ('Directing', 'Director', 'Pete Docter')), '862'),
+        (cast, crew(('Writing', 'Screenplay', 'Jonathan Hensleigh')), '8844'), # no director
+        (cast, crew(('Directing', 'Director', 'Michael Mann')), '949'),
+        (cast, crew(('Directing', 'Director', 'Someone Else')), '949'), # repeated id
+        (cast, crew(('Directing', 'Director', 'Forest Whitaker')), '31357'),
+        (cast, crew(('Directing', 'Director', 'Nobody')), '100'),
+    ], columns=['cast', 'crew', 'id']).to_csv(os.path.join(directory, 'credits.csv'), index=False)
+
+    pd.DataFrame([
+        ('862', names('jealousy', 'toy', 'friendship')),
+        ('862', names('duplicate')),
+        ('8844', names('board game', 'jungle')),
+        ('949', names('robbery', 'los angeles')),
+        ('31357', names('friendship', 'divorce')),
+    ], columns=['id', 'keywords']).to_csv(os.path.join(directory, 'keywords.csv'), index=False)
+
+
+class ArtifactTestCase(TestCase):
+    def setUp(self):
+        self.artifacts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.artifacts_dir)
+        write_artifacts(self.artifacts_dir)
+
+        settings_override = override_settings(ARTIFACTS_DIR=self.artifacts_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.reset_artifacts()
+        self.addCleanup(self.reset_artifacts)
+
+    def reset_artifacts(self):
+        artifacts._BUNDLE = None
+        artifacts._next_check = 0.0
+
+
+class RecommendationTests(ArtifactTestCase):
+    def test_recommendations_by_title(self):
+        recs = utils.get_recommendations('toy story')
+        self.assertEqual([r.movie_id for r in recs], [20, 50, 60, 30, 40])
+        self.assertEqual(recs[0].title, 'Toy Story 2')
+        self.assertEqual(recs[0].year, 1999)
+
+    def test_recommendations_by_id_beats_title(self):
+        recs = utils.get_recommendations('Some Other Title', movie_id=30)
+        self.assertEqual(recs[0].movie_id, 60)
+
+    def test_recommendations_never_include_the_movie_itself(self):
+        similarity = SIMILARITY.copy()
+        similarity[0] = [1, 0, 4, 5, 2, 3] # a tie put Toy Story 2 first
+        np.save(os.path.join(self.artifacts_dir, 'similarity.npy'), similarity)
+        self.assertEqual([r.movie_id for r in utils.get_recommendations('Toy Story')], [20, 50, 60, 30, 40])
+
+    def test_recommendations_by_id_use_one_bundle(self):
+        bundle = artifacts.get_bundle()
+        # A build without movie 30 swapped in after the id check must not be used
+        with mock.patch.object(utils, 'get_bundle', side_effect=[bundle, artifacts.ArtifactBundle.empty()]):
+            recs = utils.get_recommendations_by_id(30)
+        self.assertEqual(recs[0].movie_id, 60)
+        self.assertIsNone(utils.get_recommendations_by_id(99))
+
+    def test_unknown_title(self):
+        self.assertEqual(utils.get_recommendations('Nope'), [])
+
+    def test_search_returns_records_in_artifact_order(self):
+        results = utils.search_movies('toy', 'title')
+        self.assertEqual([m.tmdb_id for m in results], [10, 20])
+        self.assertEqual(results[1].poster_path, '/toy2.jpg')
+
+    def test_search_by_genre_and_language(self):
+        self.assertEqual([m.tmdb_id for m in utils.search_movies('advent', 'genre')], [30, 60])
+        self.assertEqual([m.tmdb_id for m in utils.search_movies('FR', 'language')], [60])
+        self.assertEqual(utils.search_movies('western', 'genre'), [])
+
+    def test_similar_to_rows_needs_embeddings(self):
+        self.assertEqual(len(utils.similar_to_rows(artifacts.get_bundle(), [0])), 0)
+        embeddings = np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0], [0.8, 0.2], [0.6, 0.8]], dtype=np.float32)
+        write_artifacts(self.artifacts_dir, embeddings=embeddings)
+        bundle = artifacts.reload_artifacts()
+        self.assertIsInstance(bundle.embeddings, np.memmap)
+        self.assertEqual(utils.similar_to_rows(bundle, [0, 1], k=3).tolist(), [4, 5, 2])
+
+    def test_rebuild_drops_optional_files_of_the_previous_build(self):
+        embeddings = np.eye(len(MOVIES), 2, dtype=np.float32)
+        write_artifacts(self.artifacts_dir, embeddings=embeddings, signatures=embeddings.astype(np.float16))
+        self.assertIsNotNone(artifacts.reload_artifacts().embeddings)
+        # Rebuilt without --embedding-dims into the same folder
+        write_artifacts(self.artifacts_dir)
+        bundle = artifacts.reload_artifacts()
+        self.assertIsNone(bundle.embeddings)
+        self.assertIsNone(bundle.signatures)
+        self.assertFalse(os.path.exists(os.path.join(self.artifacts_dir, 'embeddings.npy')))
+
+    def test_rebuild_leaves_memory_mapped_embeddings_of_the_old_build_intact(self):
+        embeddings = np.eye(len(MOVIES), 2, dtype=np.float32)
+        write_artifacts(self.artifacts_dir, embeddings=embeddings)
+        old = artifacts.reload_artifacts()
+        # Rebuilt into the folder being served: a new file, not the mapped one rewritten
+        write_artifacts(self.artifacts_dir, embeddings=embeddings[::-1] * 2)
+        np.testing.assert_array_equal(old.embeddings, embeddings)
+        np.testing.assert_array_equal(artifacts.reload_artifacts().embeddings, embeddings[::-1] * 2)
+        self.assertFalse([name for name in os.listdir(self.artifacts_dir) if name.endswith('.tmp')])
+
+    def test_files_missing_from_the_manifest_are_ignored(self):
+        # e.g. copied in by hand next to a build that doesn't list it
+        np.save(os.path.join(self.artifacts_dir, 'embeddings.npy'), np.eye(len(MOVIES), 2, dtype=np.float32))
+        self.assertIsNone(artifacts.reload_artifacts().embeddings)
+        call_command('publish_artifacts', self.artifacts_dir, '--name', 'v2', stdout=StringIO())
+        self.assertNotIn('embeddings.npy', os.listdir(os.path.join(self.artifacts_dir, 'v2')))
+        self.assertIn('manifest.json', os.listdir(os.path.join(self.artifacts_dir, 'v2')))
+
+    def test_legacy_artifacts_fall_back_to_dataframe(self):
+        os.remove(os.path.join(self.artifacts_dir, 'manifest.json'))
+        os.remove(os.path.join(self.artifacts_dir, 'movie_meta.npz'))
+        os.remove(os.path.join(self.artifacts_dir, 'similarity.npy'))
+        with open(os.path.join(self.artifacts_dir, 'similarity.pkl'), 'wb') as f:
+            pickle.dump(SIMILARITY, f)
+        results = utils.search_movies('jumanji', 'title')
+        self.assertEqual([(m.tmdb_id, m.year, m.poster_path) for m in results], [(30, 1995, None)])
+        self.assertEqual(utils.get_recommendations('Jumanji')[0].movie_id, 60)
+
+
+class BuilderContractTests(ArtifactTestCase):
+    def test_builder_output_round_trips_through_load_bundle(self):
+        bundle = artifacts.load_bundle(self.artifacts_dir)
+        metadata = bundle.metadata
+        self.assertEqual(metadata.movie_id.tolist(), [m[0] for m in MOVIES])
+        self.assertEqual(list(metadata.title), [m[1] for m in MOVIES])
+        self.assertEqual(metadata.year.tolist(), [1995, 1999, 1995, 1995, 2006, 2009])
+        self.assertIsNone(metadata.record(2).poster_path)
+        self.assertEqual(metadata.record(5).vote_count, 7048)
+        self.assertEqual(metadata.genres(5), ['Animation', 'Adventure'])
+        self.assertEqual(metadata.director_code.tolist(), [0, 0, 1, 2, 0, 3])
+        self.assertEqual(metadata.collection_code.tolist(), [0, 0, -1, -1, -1, -1])
+        self.assertEqual(bundle.similarity.tolist(), SIMILARITY.tolist())
+        self.assertEqual(bundle.scores.dtype, np.float16)
+        self.assertIsNone(bundle.signatures)
+
+
+class WeightingTests(TestCase):
+    # 3 movies x 3 terms; document frequencies 2, 2, 1 and lengths 3, 1, 4
+    COUNTS = np.array([[2, 1, 0], [0, 1, 0], [1, 0, 3]])
+
+    def weighted(self, weighting):
+        return generate_models.weight_counts(scipy.sparse.csr_matrix(self.COUNTS), weighting).toarray()
+
+    def test_count_keeps_raw_counts(self):
+        np.testing.assert_array_equal(self.weighted('count'), self.COUNTS)
+
+    def test_tfidf(self):
+        # (1 + ln tf) * (ln((1 + n) / (1 + df)) + 1)
+        common, rare = np.log(4 / 3) + 1, np.log(2) + 1
+        expected = [[(1 + np.log(2)) * common, common, 0],
+                    [0, common, 0],
+                    [common, 0, (1 + np.log(3)) * rare]]
+        np.testing.assert_allclose(self.weighted('tfidf'), expected, rtol=1e-6)
+
+    def test_bm25(self):
+        # idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len)), k1 = 1.2, b = 0.75, avg_len = 8/3
+        common, rare = np.log(1 + 1.5 / 2.5), np.log(1 + 2.5 / 1.5)
+
+        def bm25(idf, tf, length):
+            return idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length * 3 / 8))
+
+        expected = [[bm25(common, 2, 3), bm25(common, 1, 3), 0],
+                    [0, bm25(common, 1, 1), 0],
+                    [bm25(common, 1, 4), 0, bm25(rare, 3, 4)]]
+        np.testing.assert_allclose(self.weighted('bm25'), expected, rtol=1e-6)
+
+    def test_unknown_weighting(self):
+        with self.assertRaises(ValueError):
+            self.weighted('log')
+
+    def test_field_weights_must_be_finite_and_not_negative(self):
+        self.assertEqual(generate_models.parse_field_weights('genres=0, cast=1.5'), {'genres': 0.0, 'cast': 1.5})
+        for text in ('genres=-1', 'genres=nan', 'cast=inf', 'cast=heavy', 'cast', 'plot=1'):
+            with self.subTest(text=text), self.assertRaises(argparse.ArgumentTypeError):
+                generate_models.parse_field_weights(text)
+
+    def test_zero_field_weight_drops_the_field(self):
+        # Movies 0 and 1 share only their genres, 0 and 2 everything else
+        df = pd.DataFrame({
+            'overview': ['space pirates treasure', 'bank heist detective', 'space treasure map'],
+            'genres': ['animation comedy', 'animation comedy', 'drama'],
+            'keywords': ['pirate', 'heist', 'pirate'],
+            'cast': ['tomhanks', 'alpacino', 'tomhanks'],
+            'crew': ['johnlasseter', 'michaelmann', 'johnlasseter'],
+        })
+        with redirect_stdout(StringIO()):
+            default = generate_models.vectorize(df)
+            no_genres = generate_models.vectorize(df, field_weights=generate_models.parse_field_weights('genres=0'))
+        self.assertGreater((default[0] @ default[1].T).toarray()[0, 0], 0)
+        self.assertEqual((no_genres[0] @ no_genres[1].T).nnz, 0)
+        self.assertGreater((no_genres[0] @ no_genres[2].T).toarray()[0, 0], 0)
+        # The genre vocabulary (animation, comedy) is gone from the matrix
+        self.assertEqual(default.shape[1] - no_genres.shape[1], 2)
+
+
+class StageCacheTests(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.data_dir = os.path.join(self.work_dir, 'data')
+        self.cache_dir = os.path.join(self.work_dir, 'cache')
+        write_tmdb_csvs(self.data_dir)
+
+    def build(self, *args):
+        """Run generate_models.py into a fresh folder. Returns (stages read from the cache, output folder)."""
+        output_dir = tempfile.mkdtemp(dir=self.work_dir)
+        out = StringIO()
+        with redirect_stdout(out):
+            generate_models.main(['--data-dir', self.data_dir, '--output-dir', output_dir,
+                                  '--cache-dir', self.cache_dir, *args])
+        cached = {line.split()[2] for line in out.getvalue().splitlines() if line.startswith('Using cached ')}
+        return cached, output_dir
+
+    def assertSameArtifacts(self, first, second):
+        for name in ('similarity.npy', 'similarity_scores.npy', 'signatures.npy'):
+            np.testing.assert_array_equal(np.load(os.path.join(first, name)), np.load(os.path.join(second, name)))
+        with np.load(os.path.join(first, 'movie_meta.npz')) as a, np.load(os.path.join(second, 'movie_meta.npz')) as b:
+            self.assertEqual(sorted(a.files), sorted(b.files))
+            for name in a.files:
+                np.testing.assert_array_equal(a[name], b[name])
+        a = scipy.sparse.load_npz(os.path.join(first, 'tag_vectors.npz'))
+        b = scipy.sparse.load_npz(os.path.join(second, 'tag_vectors.npz'))
+        self.assertEqual((a != b).nnz, 0)
+
+    def test_key_changes_with_parameters(self):
+        key = generate_models.StageCache.key
+        weights = dict(generate_models.FIELD_WEIGHTS)
+        base = key('vectorize', 'upstream', 'tfidf', weights)
+        self.assertEqual(base, key('vectorize', 'upstream', 'tfidf', dict(reversed(weights.items()))))
+        self.assertNotEqual(base, key('vectorize', 'upstream', 'bm25', weights))
+        self.assertNotEqual(base, key('vectorize', 'upstream', 'tfidf', {**weights, 'genres': 0.0}))
+
+    def test_key_changes_with_the_upstream_key(self):
+        key, file_key = generate_models.StageCache.key, generate_models.StageCache.file_key
+        csvs = [os.path.join(self.data_dir, name) for name in ('movies_metadata.csv', 'credits.csv', 'keywords.csv')]
+        load_key = file_key(csvs)
+        self.assertNotEqual(key('preprocess', load_key), key('preprocess', 'other'))
+        # Touching an input file changes the load key, and so every key after it
+        st = os.stat(csvs[0])
+        os.utime(csvs[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.assertNotEqual(file_key(csvs), load_key)
+        self.assertNotEqual(key('preprocess', file_key(csvs)), key('preprocess', load_key))
+
+    def test_unchanged_rerun_reuses_the_cache(self):
+        cached, first = self.build()
+        self.assertEqual(cached, set())
+        cached, second = self.build()
+        # Stemmed data in the cache makes load and preprocess unnecessary
+        self.assertEqual(cached, {'stem', 'vectorize', 'similarity', 'signatures'})
+        self.assertSameArtifacts(first, second)
+
+    def test_new_parameters_recompute_only_later_stages(self):
+        self.build()
+        cached, _ = self.build('--weighting', 'bm25')
+        self.assertEqual(cached, {'stem'})
+        cached, _ = self.build('--field-weights', 'genres=0')
+        self.assertEqual(cached, {'stem'})
+
+    def test_from_stage_and_force(self):
+        _, first = self.build()
+        cached, second = self.build('--from-stage', 'similarity')
+        self.assertEqual(cached, {'stem', 'vectorize'})
+        self.assertSameArtifacts(first, second)
+        cached, third = self.build('--from-stage', 'stem')
+        self.assertEqual(cached, {'preprocess'})
+        cached, fourth = self.build('--force')
+        self.assertEqual(cached, set())
+        self.assertSameArtifacts(first, fourth)
+
+    def test_prune_keeps_the_latest_entries_of_each_stage(self):
+        cache = generate_models.StageCache(self.cache_dir)
+        cache.put('similarity', 'other', np.zeros(1))
+        for i in range(4):
+            path = os.path.join(self.cache_dir, f'vectorize-key{i}.array.npy')
+            cache.put('vectorize', f'key{i}', np.full(1, i))
+            # Oldest first, whatever the file system's timestamp resolution
+            os.utime(path, (1_000_000 + i, 1_000_000 + i))
+        kept = sorted(name for name in os.listdir(self.cache_dir) if name.startswith('vectorize-'))
+        expected = [f'vectorize-key{i}.array.npy' for i in range(4 - cache.KEEP, 4)]
+        self.assertEqual(kept, expected)
+        self.assertTrue(cache.hit('similarity', 'other'))
+        self.assertFalse(cache.hit('vectorize', 'key0'))
+
+
+class TmdbDataTests(TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        write_tmdb_csvs(self.data_dir)
+
+    def test_director_only_keeps_the_first_director(self):
+        several = crew(('Directing', 'Co-Director', 'Lee Unkrich'), ('Directing', 'Director', 'John Lasseter'),
+                       ('Directing', 'Director', 'Pete Docter'))
+        self.assertEqual(generate_models.fetch_director(tmdb_data.director_only(several)), ['John Lasseter'])
+        self.assertEqual(generate_models.fetch_director(several), ['John Lasseter'])
+        self.assertEqual(tmdb_data.director_only(crew(('Writing', 'Screenplay', 'Joss Whedon'))), '[]')
+        self.assertTrue(pd.isna(tmdb_data.director_only(np.nan)))
+
+    def test_catalog_rows(self):
+        movies = tmdb_data.load_catalog(self.data_dir)
+        # No shifted row, no movie without a release date, one row per movie
+        self.assertEqual(movies['id'].tolist(), [862, 8844, 949, 31357])
+        self.assertEqual(movies['id'].dtype, np.int64)
+        self.assertNotIn('budget', movies)
+        self.assertEqual(movies['vote_count'].isna().tolist(), [False, False, False, True])
+        directors = [generate_models.fetch_director(c) for c in movies['crew']]
+        self.assertEqual(directors, [['John Lasseter'], [], ['Michael Mann'], ['Forest Whitaker']])
+        with redirect_stdout(StringIO()):
+            new_df = generate_models.preprocess_data(movies)
+        self.assertEqual(new_df.set_index('movie_id')['director'].to_dict(),
+                         {862: 'John Lasseter', 8844: '', 949: 'Michael Mann'})
+
+    def test_read_related_dedupes_ids(self):
+        keywords = tmdb_data.read_related(self.data_dir, 'keywords.csv', ['keywords'], [862, 949])
+        self.assertEqual(keywords['id'].tolist(), [862, 949])
+        self.assertIn('jealousy', keywords['keywords'].iloc[0])
+        credits = tmdb_data.read_related(self.data_dir, 'credits.csv', ['crew'], [949],
+                                         converters={'crew': tmdb_data.director_only})
+        self.assertEqual(generate_models.fetch_director(credits['crew'].iloc[0]), ['Michael Mann'])
+
+    def test_binary_cache_follows_the_csv(self):
+        cache_dir = os.path.join(self.data_dir, 'cache')
+        path = os.path.join(self.data_dir, 'movies_metadata.csv')
+        first = tmdb_data.read_csv(path, ['id', 'title'], cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        # Served from the cache: no CSV parsing
+        with mock.patch.object(tmdb_data.pd, 'read_csv', side_effect=AssertionError('parsed the CSV')):
+            pd.testing.assert_frame_equal(tmdb_data.read_csv(path, ['id', 'title'], cache_dir=cache_dir), first)
+        write_tmdb_csvs(self.data_dir, extra_movies=[
+            ('False', '', '0', names('Crime'), '5', 'en', 'Four rooms.', '9.0', '', '1995-12-09', 'Four Rooms', '6.5', '539'),
+        ])
+        changed = tmdb_data.read_csv(path, ['id', 'title'], cache_dir=cache_dir)
+        self.assertEqual(changed['title'].iloc[-1], 'Four Rooms')
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+        # Other columns are another cache entry
+        tmdb_data.read_csv(path, ['id'], cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+    def test_import_45k_rows(self):
+        # What the command imported from this file when it parsed it with
+        # pd.read_csv(low_memory=False), before tmdb_data
+        expected = [
+            (862, 'Toy Story', 'Led by Woody, toys live happily in a room.', 21.94, 7.7, 5415, '["Animation", "Comedy"]',
+             date(1995, 10, 30), '/toy.jpg'),
+            (949, 'Heat', 'A group of professional bank robbers in Los Angeles.', 17.92, 7.7, 1886, '["Action", "Crime"]',
+             date(1995, 12, 15), '/heat.jpg'),
+            (8844, 'Jumanji', 'Siblings find a magical board game in the attic.', 17.01, 6.9, 2413,
+             '["Adventure", "Fantasy"]', date(1995, 12, 15), '/jumanji.jpg'),
+            (31357, 'Waiting to Exhale', 'Four women wait for the right man.', 3.86, 6.1, 0, '["Comedy", "Drama"]',
+             date(1995, 12, 22), None),
+        ]
+        fields = ['tmdb_id', 'title', 'overview', 'popularity', 'vote_average', 'vote_count', 'genres', 'release_date',
+                  'poster_path']
+        cache_dir = os.path.join(self.data_dir, 'cache')
+        for _ in range(2): # parsed, then from the binary cache
+            Movie.objects.all().delete()
+            call_command('import_45k', '--data-dir', self.data_dir, '--cache-dir', cache_dir, stdout=StringIO())
+            self.assertEqual(list(Movie.objects.order_by('tmdb_id').values_list(*fields)), expected)
+
+
+class RankingTests(ArtifactTestCase):
+    def setUp(self):
+        super().setUp()
+        # Cosine scores for the SIMILARITY rows, as generate_models.py writes them
+        self.scores = np.tile(np.array([1.0, 0.5, 0.49, 0.48, 0.3, 0.2], dtype=np.float16), (len(MOVIES), 1))
+        np.save(os.path.join(self.artifacts_dir, 'similarity_scores.npy'), self.scores)
+
+    def recommended(self, **weights):
+        weights = ranking.parse_weights(weights)
+        return [r.movie_id for r in utils.get_recommendations('Toy Story', weights=weights)]
+
+    def test_weighted_rating_pulls_few_votes_to_the_mean(self):
+        quality = ranking.weighted_rating([9.0, 8.0, 6.0, 4.0], [0, 10, 1000, 1000])
+        self.assertAlmostEqual(quality[0], 0.6, places=5) # no votes: the mean of voted movies
+        self.assertGreater(quality[1], quality[0])
+        self.assertLess(quality[1], 0.7)
+
+    @override_settings(RECOMMENDATION_WEIGHTS={'quality': 0.0})
+    def test_pure_content_order_by_default(self):
+        self.assertEqual(self.recommended(), [20, 50, 60, 30, 40])
+
+    def test_quality_and_recency_rerank_candidates(self):
+        self.assertEqual(self.recommended(quality=5), [60, 20, 50, 40, 30])
+        self.assertEqual(self.recommended(quality=0, recency=5), [60, 50, 20, 30, 40])
+
+    def test_parse_weights_ignores_bad_values(self):
+        weights = ranking.parse_weights({'quality': 'lots', 'recency': '1e9', 'half_life': '-3', 'similarity': 'nan'})
+        self.assertEqual(weights.quality, ranking.default_weights().quality)
+        self.assertEqual(weights.recency, ranking.MAX_WEIGHT)
+        self.assertEqual(weights.half_life, 0.5)
+        self.assertEqual(weights.similarity, 1.0)
+
+    def test_director_cap_pushes_repeats_to_the_end(self):
+        recs = utils.get_recommendations('Toy Story 2', weights=ranking.parse_weights({'quality': 0, 'max_per_director': 1}))
+        self.assertEqual([r.movie_id for r in recs], [10, 60, 30, 40, 50])
+
+    def test_mmr_skips_near_duplicates(self):
+        # Toy Story, Toy Story 2 and Cars have the same signature, the rest are orthogonal
+        signatures = np.eye(4, dtype=np.float16)[[0, 0, 1, 2, 0, 3]]
+        write_artifacts(self.artifacts_dir, scores=self.scores, signatures=signatures)
+        weights = ranking.parse_weights({'quality': 0, 'max_per_collection': 0})
+        self.assertEqual([r.movie_id for r in utils.get_recommendations('Toy Story 2', weights=weights)],
+                         [10, 50, 60, 30, 40])
+        weights = weights._replace(diversity=0.5)
+        self.assertEqual([r.movie_id for r in utils.get_recommendations('Toy Story 2', weights=weights)],
+                         [10, 60, 30, 40, 50])
+
+    def test_detail_view_takes_weights_from_query_string(self):
+        Movie.objects.create(tmdb_id=10, title='Toy Story', vote_average=7.7)
+        response = self.client.get('/movie/10/', {'quality': '0', 'recency': '5'})
+        self.assertEqual([r.movie_id for r in response.context['recommendations']], [60, 50, 20, 30, 40])
+
+
+@override_settings(ARTIFACTS_RELOAD_INTERVAL=0)
+class HotSwapTests(ArtifactTestCase):
+    def publish(self, similarity, version):
+        build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, build_dir)
+        write_artifacts(build_dir)
+        np.save(os.path.join(build_dir, 'similarity.npy'), similarity)
+        call_command('publish_artifacts', build_dir, '--name', version, stdout=StringIO())
+
+    def test_published_build_is_swapped_in(self):
+        old = artifacts.get_bundle()
+        with open(os.path.join(self.artifacts_dir, 'manifest.json')) as f:
+            self.assertEqual(old.version, json.load(f)['version'])
+
+        similarity = SIMILARITY.copy()
+        similarity[0] = [0, 3, 2, 1, 4, 5]
+        self.publish(similarity, 'v2')
+        new = artifacts.get_bundle()
+        self.assertEqual(new.version, 'v2')
+        self.assertEqual(utils.get_recommendations('Toy Story')[0].movie_id, 40)
+        # A request still holding the old bundle keeps seeing the old build
+        self.assertEqual(old.metadata.record(old.similarity[0][1]).movie_id, 20)
+
+        call_command('publish_artifacts', '--activate', 'v2', stdout=StringIO())
+        self.assertIs(artifacts.get_bundle(), new)
+
+    def test_unversioned_folder_reloads_when_the_manifest_changes(self):
+        old = artifacts.get_bundle()
+        # A build being written: new similarity.npy, manifest not replaced yet
+        similarity = SIMILARITY.copy()
+        similarity[0] = [0, 3, 2, 1, 4, 5]
+        np.save(os.path.join(self.artifacts_dir, 'similarity.npy'), similarity)
+        self.assertIs(artifacts.get_bundle(), old)
+        write_artifacts(self.artifacts_dir, similarity=similarity)
+        self.assertEqual(utils.get_recommendations('Toy Story')[0].movie_id, 40)
+
+    def test_failed_load_keeps_previous_bundle(self):
+        old = artifacts.get_bundle()
+        np.save(os.path.join(self.artifacts_dir, 'similarity.npy'), SIMILARITY[:3])
+        bundle = artifacts.reload_artifacts()
+        self.assertIs(bundle.similarity, old.similarity)
+        self.assertEqual(utils.get_recommendations('Toy Story')[0].movie_id, 20)
+        # Not retried on every request until the files change again
+        self.assertIs(artifacts.get_bundle(), bundle)
+
+    def test_publish_rejects_broken_build(self):
+        build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, build_dir)
+        with self.assertRaises(CommandError):
+            call_command('publish_artifacts', build_dir, '--name', 'broken', stdout=StringIO())
+        self.assertFalse(os.path.exists(os.path.join(self.artifacts_dir, 'broken')))
+        self.assertFalse(os.path.exists(os.path.join(self.artifacts_dir, artifacts.CURRENT_POINTER)))
+
+    @override_settings(ARTIFACTS_RELOAD_INTERVAL=None)
+    def test_reload_signal_swaps_without_polling(self):
+        old = artifacts.get_bundle()
+        write_artifacts(self.artifacts_dir, similarity=SIMILARITY[::-1])
+        self.assertIs(artifacts.get_bundle(), old)
+        artifacts._request_reload(None, None)
+        self.assertEqual(utils.get_recommendations('Toy Story')[0].movie_id, 60)
+
+    @override_settings(ARTIFACTS_RELOAD_INTERVAL=None)
+    def test_reload_signal_retries_a_failed_load(self):
+        old = artifacts.get_bundle()
+        with mock.patch.object(artifacts, 'load_bundle', side_effect=MemoryError), self.assertLogs('core.artifacts'):
+            artifacts._request_reload(None, None)
+            self.assertIs(artifacts.get_bundle().similarity, old.similarity)
+        # Same files, so the key is unchanged; the signal reloads anyway
+        artifacts._request_reload(None, None)
+        bundle = artifacts.get_bundle()
+        self.assertIsNot(bundle.similarity, old.similarity)
+        self.assertEqual(bundle.key, old.key)
+
+    @skipUnless(hasattr(signal, 'SIGHUP'), 'no SIGHUP on this platform')
+    def test_gunicorn_worker_hook_installs_reload_signal(self):
+        spec = importlib.util.spec_from_file_location('gunicorn_conf', settings.BASE_DIR / 'gunicorn.conf.py')
+        conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(conf)
+        # What a gunicorn worker does to SIGHUP before post_worker_init
+        self.addCleanup(signal.signal, signal.SIGHUP, signal.signal(signal.SIGHUP, signal.SIG_DFL))
+        conf.post_worker_init(worker=None)
+        self.assertIs(signal.getsignal(signal.SIGHUP), artifacts._request_reload)
+
+    def test_bundle_is_immutable(self):
+        bundle = artifacts.get_bundle()
+        with self.assertRaises(AttributeError):
+            bundle.version = 'x'
+        with self.assertRaises(ValueError):
+            bundle.similarity[0, 0] = 1
+
+
+class MetricsTests(ArtifactTestCase):
+    def setUp(self):
+        super().setUp()
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+
+    def test_histogram_quantiles(self):
+        h = Histogram((1, 2, 5, 10))
+        for value in [0.5] * 50 + [3] * 49 + [8]:
+            h.observe(value)
+        self.assertLessEqual(h.quantile(0.5), 1)
+        self.assertTrue(2 <= h.quantile(0.99) <= 5)
+        self.assertEqual(h.quantile(1.0), 8)
+
+    def test_metrics_endpoint_reports_stages_and_queries(self):
+        Movie.objects.create(title='Toy Story', tmdb_id=10)
+        self.client.get(reverse('movie_detail', args=[10]))
+        self.client.get(reverse('search'), {'q': 'toy', 'type': '<script>'})
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        for stage in ('artifact_load', 'index_lookup', 'neighbour_fetch', 'db_enrichment', 'search_other'):
+            self.assertIn(f'recommender_stage_seconds_count{{stage="{stage}"}} 1', body)
+        self.assertIn('recommender_view_db_queries_count{view="movie_detail"} 1', body)
+        self.assertIn('recommender_view_db_queries_sum{view="movie_detail"} 1', body)
+        self.assertIn('recommender_stage_seconds_quantile{stage="neighbour_fetch",quantile="0.99"}', body)
+        self.assertIn('recommender_artifact_cache_total{result="loaded"} 1', body)
+
+    def test_metrics_endpoint_is_local_only(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_token_replaces_the_address_check(self):
+        # Behind a same-host proxy every request comes from 127.0.0.1
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret', REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 200)
+
+    def test_errors_are_logged(self):
+        with mock.patch.object(utils, 'neighbour_rows', side_effect=RuntimeError('boom')), \
+                self.assertLogs('core.utils', 'ERROR') as logs:
+            self.assertEqual(utils.get_recommendations('Toy Story'), [])
+        self.assertIn('boom', logs.output[0])
+
+
+class EvaluationTests(ArtifactTestCase):
+    def test_quality_metrics(self):
+        bundle = artifacts.get_bundle()
+        metrics, recs = evaluate(bundle, k=2, samples=10)
+        self.assertEqual(recs[2].tolist(), [5, 0])
+        # 9 of the 12 recommendations share a genre with their source movie
+        self.assertAlmostEqual(metrics['genre_coherence'], 0.75)
+        self.assertAlmostEqual(metrics['catalog_coverage'], 5 / 6)
+        self.assertEqual(metrics['zero_vote_share'], 0.0)
+        # Toy Story and Toy Story 2 recommend each other
+        self.assertEqual(metrics['same_collection_share'], 0.5)
+        self.assertIsNone(metrics['intra_list_similarity']) # no signatures.npy
+        self.assertEqual(neighbour_overlap(bundle, recs, bundle, recs)['overlap_at_k'], 1.0)
+
+    def test_command_compares_two_builds(self):
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        write_artifacts(other)
+        out = StringIO()
+        call_command('evaluate_artifacts', self.artifacts_dir, other, '-k', '2', '--samples', '5', stdout=out)
+        self.assertIn('genre_coherence', out.getvalue())
+        self.assertIn('overlap@2 between builds: 1 over 6 shared movies', out.getvalue())
+
+
+class StringTableTests(TestCase):
+    def test_round_trip_and_search(self):
+        table = StringTable(['Heat', '', 'Héat 2', 'heathers'])
+        self.assertEqual(list(table), ['Heat', '', 'Héat 2', 'heathers'])
+        self.assertEqual(table[2], 'Héat 2')
+        self.assertEqual(table.find_rows('eat'), [0, 3])
+        self.assertEqual(table.find_rows('eat', limit=1), [0])
+        self.assertEqual(StringTable.from_bytes(string_table(list(table)), len(table))[3], 'heathers')
+        self.assertEqual(len(StringTable.from_bytes(string_table([]), 0)), 0)
+
+
+class ViewTests(ArtifactTestCase):
+    def test_search_view_skips_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('search'), {'q': 'toy', 'type': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0)
+        self.assertContains(response, 'Toy Story 2')
+
+    def test_detail_view_queries_only_the_movie(self):
+        Movie.objects.create(title='Toy Story', tmdb_id=10, overview='Woody and Buzz.')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movie_detail', args=[10]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Toy Story 2')
+        self.assertContains(response, reverse('movie_detail', args=[50]))
+
+    async def test_async_detail_view_counts_queries(self):
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+        await Movie.objects.acreate(title='Toy Story', tmdb_id=10)
+        response = await views.amovie_detail(AsyncRequestFactory().get('/movie/10/'), 10)
+        self.assertContains(response, 'Toy Story 2')
+        self.assertEqual(REGISTRY.histogram('recommender_view_db_queries', view='movie_detail').sum, 1)
+        with self.assertRaises(Http404):
+            await views.amovie_detail(AsyncRequestFactory().get('/movie/99/'), 99)
+
+    async def test_async_detail_view_falls_back_to_title(self):
+        # Imported under another id than the build's
+        await Movie.objects.acreate(title='Toy Story', tmdb_id=999)
+        response = await views.amovie_detail(AsyncRequestFactory().get('/movie/999/'), 999)
+        self.assertContains(response, 'Toy Story 2')
+
+    def test_more_like_these_view(self):
+        embeddings = np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0], [0.8, 0.2], [0.6, 0.8]], dtype=np.float32)
+        self.assertEqual(list(self.client.get(reverse('similar'), {'ids': '10,20'}).context['movies']), [])
+        write_artifacts(self.artifacts_dir, embeddings=embeddings)
+        artifacts.reload_artifacts()
+        # Unknown and malformed ids are skipped
+        response = self.client.get(reverse('similar'), {'ids': '10,99,x,²,-5,20'})
+        self.assertEqual([m.tmdb_id for m in response.context['movies']], [50, 60, 30, 40])
+        self.assertContains(response, 'More like "Toy Story, Toy Story 2"')
+        self.assertEqual(list(self.client.get(reverse('similar')).context['movies']), [])
+
+    async def test_async_search_and_index_views(self):
+        await Movie.objects.acreate(title='Heat', tmdb_id=40, popularity=17.9)
+        response = await views.asearch(AsyncRequestFactory().get('/search/', {'q': 'toy'}))
+        self.assertContains(response, 'Toy Story 2')
+        self.assertContains(await views.aindex(AsyncRequestFactory().get('/')), 'Heat')
+
+    async def test_async_more_like_these_view(self):
+        embeddings = np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0], [0.8, 0.2], [0.6, 0.8]], dtype=np.float32)
+        await sync_to_async(write_artifacts)(self.artifacts_dir, embeddings=embeddings)
+        response = await views.asimilar(AsyncRequestFactory().get('/similar/', {'ids': ['10', '20']}))
+        self.assertContains(response, 'Cars')
+        self.assertNotContains(response, 'Search Results')
+
+
+class StartupProfileTests(ArtifactTestCase):
+    def test_serving_path_skips_heavy_imports(self):
+        out = StringIO()
+        call_command('startup_profile', '--top', '3', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Artifact load:', output)
+        self.assertIn(f'({len(MOVIES)} movies)', output)
+        self.assertIn('No heavy modules', output)
@@ -1,8 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# asgi.py turns on ASYNC_VIEWS; WSGI workers serve the sync views
+if settings.ASYNC_VIEWS:
+    index, search, movie_detail, similar = views.aindex, views.asearch, views.amovie_detail, views.asimilar
+else:
+    index, search, movie_detail, similar = views.index, views.search, views.movie_detail, views.similar
+
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('search/', views.search, name='search'),
-    path('movie/<int:movie_id>/', views.movie_detail, name='movie_detail'),
+    path('', index, name='index'),
+    path('search/', search, name='search'),
+    path('movie/<int:movie_id>/', movie_detail, name='movie_detail'),
+    path('similar/', similar, name='similar'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
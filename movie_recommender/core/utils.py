@@ -1,103 +1,168 @@
-import os
-import pickle
-import pandas as pd
-from django.conf import settings
+import logging
 
-# Global cache for artifacts
-_MOVIES_DF = None
-_SIMILARITY = None
+import numpy as np
+
+from .artifacts import get_bundle
+from .metrics import count, timed
+from .ranking import default_weights, rerank, reranks
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TYPES = ('title', 'language', 'genre')
+# Movies a "more like these" query may start from
+MAX_SEED_MOVIES = 20
 
 def load_artifacts():
-    global _MOVIES_DF, _SIMILARITY
-    if _MOVIES_DF is None or _SIMILARITY is None:
-        base_dir = settings.BASE_DIR.parent # Recommendation_System root
-        
-        # Updated filenames
-        movies_path = os.path.join(base_dir, 'movies.pkl') # Was movie_list.pkl
-        sim_path = os.path.join(base_dir, 'similarity.pkl') # Fixed typo
-        
-        if not os.path.exists(movies_path) or not os.path.exists(sim_path):
-            print(f"Artifacts not found at {movies_path}. Checking artifacts dir...")
-            movies_path = os.path.join(base_dir, 'artifacts', 'movies.pkl')
-            sim_path = os.path.join(base_dir, 'artifacts', 'similarity.pkl')
-        
-        try:
-            with open(movies_path, 'rb') as f:
-                _MOVIES_DF = pickle.load(f)
-            with open(sim_path, 'rb') as f:
-                _SIMILARITY = pickle.load(f)
-            print("Successfully loaded recommendation artifacts.")
-        except Exception as e:
-            print(f"Error loading artifacts: {e}")
-            _MOVIES_DF = pd.DataFrame()
-            _SIMILARITY = []
-
-def get_recommendations(title):
-    load_artifacts()
-    
-    if _MOVIES_DF.empty:
+    """Make sure artifacts are loaded and return the bundle being served."""
+    return get_bundle()
+
+def get_metadata():
+    return get_bundle().metadata
+
+def neighbour_rows(bundle, idx, k=5, weights=None):
+    """
+    Rows of the k movies recommended for row idx, best first.
+    Shared by the views and the offline evaluation (manage.py evaluate_artifacts).
+    With quality, recency or diversity weights the stored candidates are
+    re-ranked (ranking.py).
+    """
+    # bundle.similarity[idx] contains INDICES of top matches; their cosine
+    # scores are in bundle.scores[idx].
+    # The movie itself is normally first; drop it wherever it landed (ties).
+    candidates = bundle.similarity[idx]
+    keep = candidates != idx
+    if weights is None or not reranks(weights):
+        return candidates[keep][:k]
+
+    if bundle.scores is not None:
+        scores = bundle.scores[idx][keep]
+    else:
+        # Older builds have no scores: rank position stands in for the cosine
+        scores = 1 - np.flatnonzero(keep) / candidates.shape[0]
+    return rerank(bundle.priors, candidates[keep], scores, weights, k, bundle.signatures)
+
+def similar_to_rows(bundle, rows, k=5):
+    """
+    Rows closest to the mean embedding of the given rows (e.g. a watch list),
+    best first, excluding the rows themselves. Scores the whole catalogue,
+    so it needs a build made with --embedding-dims; finds nothing otherwise.
+    """
+    embeddings = bundle.embeddings
+    rows = np.asarray(rows, dtype=np.int64)
+    if embeddings is None or not len(rows):
+        return np.empty(0, dtype=np.int64)
+    query = embeddings[rows].mean(axis=0)
+    scores = embeddings @ query
+    scores[rows] = -np.inf
+    k = min(k, len(scores) - len(np.unique(rows)))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+def get_recommendations(title, movie_id=None, weights=None, bundle=None):
+    """
+    Return up to 5 MovieRecord rows similar to the given movie.
+    The movie is looked up by TMDB id when given, else by title.
+    weights (ranking.Weights) default to settings.RECOMMENDATION_WEIGHTS.
+    bundle is the request's bundle if the caller already holds one.
+    """
+    # One bundle for the whole call, even if a reload swaps it meanwhile
+    if bundle is None:
+        bundle = get_bundle()
+    metadata = bundle.metadata
+
+    if not len(metadata):
         return []
 
     try:
-        # Find index (Case Insensitive)
-        matches = _MOVIES_DF[_MOVIES_DF['title'].str.lower() == title.lower()]
-        if matches.empty:
+        with timed('index_lookup'):
+            idx = metadata.row_for_id(movie_id) if movie_id is not None else None
+            if idx is None and title is not None:
+                # Case insensitive, first match
+                idx = metadata.row_for_title(title)
+        if idx is None:
+            count('recommender_lookup_misses_total')
             return []
-        
-        # Use first match
-        idx = matches.index[0]
-        
-        # New Logic: _SIMILARITY[idx] now contains INDICES of top matches, not raw scores.
-        # The 0-th element is the movie itself, so we take 1:6
-        similar_indices = _SIMILARITY[idx][1:6]
-        
-        recommended_movies = []
-        for i in similar_indices:
-            row = _MOVIES_DF.iloc[i]
-            recommended_movies.append({
-                'title': row['title'],
-                'movie_id': row['movie_id'] # Ensure generate_models.py creates this column
-            })
-            
-        return recommended_movies
-    except Exception as e:
-        print(f"Error generating recommendations for {title}: {e}")
+
+        with timed('neighbour_fetch'):
+            return metadata.records(neighbour_rows(bundle, idx, weights=weights or default_weights()))
+    except Exception:
+        logger.exception("Error generating recommendations for %s (id %s)", title, movie_id)
+        count('recommender_errors_total', stage='recommendations')
         return []
 
+def get_recommendations_by_id(movie_id, weights=None):
+    """
+    get_recommendations for a TMDB id alone, or None if the build doesn't
+    have that id (the caller can then try the title).
+    """
+    bundle = get_bundle()
+    if bundle.metadata.row_for_id(movie_id) is None:
+        return None
+    return get_recommendations(None, movie_id=movie_id, weights=weights, bundle=bundle)
+
+def more_like_these(movie_ids, k=24):
+    """
+    (MovieRecord rows of the given TMDB ids, up to k MovieRecord rows like
+    all of them together), via similar_to_rows. Unknown ids are skipped and
+    at most MAX_SEED_MOVIES are used. Finds nothing unless the build has
+    embeddings (--embedding-dims).
+    """
+    bundle = get_bundle()
+    metadata = bundle.metadata
+    rows = []
+    for movie_id in movie_ids:
+        row = metadata.row_for_id(movie_id)
+        if row is not None and row not in rows:
+            rows.append(row)
+    rows = rows[:MAX_SEED_MOVIES]
+    if not rows:
+        return [], []
+
+    try:
+        with timed('similar_to_rows'):
+            similar = similar_to_rows(bundle, rows, k)
+        return metadata.records(rows), metadata.records(similar)
+    except Exception:
+        logger.exception("Error finding movies like %s", movie_ids)
+        count('recommender_errors_total', stage='similar_to_rows')
+        return metadata.records(rows), []
+
 def search_movies(query, search_type):
     """
     Search for movies by Title, Language, or Genre.
-    Returns a list of movie IDs (tmdb_id).
+    Returns a list of MovieRecord rows from the artifact metadata.
     """
-    load_artifacts()
-    if _MOVIES_DF.empty:
+    metadata = get_bundle().metadata
+    if not len(metadata):
         return []
-    
+
     query = str(query).lower().strip()
-    results = []
+    limit = 50 # Limit to top 50 results
 
     try:
-        if search_type == 'title':
-            # Simple substring match
-            mask = _MOVIES_DF['title'].str.lower().str.contains(query, na=False)
-            results = _MOVIES_DF[mask]['movie_id'].tolist()
-            
-        elif search_type == 'language':
-            # Exact match on original_language (e.g., 'en', 'ml')
-            mask = _MOVIES_DF['original_language'].astype(str).str.lower() == query
-            results = _MOVIES_DF[mask]['movie_id'].tolist()
-            
-        elif search_type == 'genre':
-            # Substring match on tags (since genres are in tags) OR check 'genres' column if we kept it
-            # We didn't keep 'genres' column in generate_models.py preprocess_data return
-            # But 'tags' includes genres.
-            # Ideally generate_models.py should have preserved 'genres' for better filtering.
-            # Fallback: Search in tags, though this might be noisy.
-            # Better: Search in tags is acceptable for now.
-            mask = _MOVIES_DF['tags'].str.contains(query, na=False)
-            results = _MOVIES_DF[mask]['movie_id'].tolist()
-            
-        return results[:50] # Limit to top 50 to avoid overloading DB
-    except Exception as e:
-        print(f"Error searching movies: {e}")
+        # Label only known types, the raw value comes from the query string
+        with timed(f'search_{search_type}' if search_type in SEARCH_TYPES else 'search_other'):
+            rows = _search_rows(metadata, query, search_type, limit)
+        return metadata.records(rows)
+    except Exception:
+        logger.exception("Error searching movies for %r (%s)", query, search_type)
+        count('recommender_errors_total', stage='search')
         return []
+
+def _search_rows(metadata, query, search_type, limit):
+    rows = []
+    if search_type == 'title':
+        # Simple substring match
+        rows = metadata.search_title(query, limit)
+
+    elif search_type == 'language':
+        # Exact match on original_language (e.g., 'en', 'ml')
+        rows = metadata.search_language(query, limit)
+
+    elif search_type == 'genre':
+        # Substring match on genre names (e.g., 'science' -> Science Fiction)
+        rows = metadata.search_genre(query, limit)
+
+    return rows
@@ -1,93 +1,150 @@
-from django.shortcuts import render, get_object_or_404
+import asyncio
+import hmac
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404, render, get_object_or_404
+from .metrics import REGISTRY, instrument_view, timed
 from .models import Movie
-from .utils import get_recommendations
+from .ranking import parse_weights
+from .utils import get_recommendations, get_recommendations_by_id, more_like_these, search_movies
 
+@instrument_view('index')
 def index(request):
     # Show top 24 popular movies (grid of 4x6)
-    movies = Movie.objects.all().order_by('-popularity')[:24]
+    with timed('db_enrichment'):
+        movies = list(Movie.objects.all().order_by('-popularity')[:24])
     return render(request, 'core/index.html', {'movies': movies})
 
+@instrument_view('movie_detail')
 def movie_detail(request, movie_id):
-    movie = get_object_or_404(Movie, tmdb_id=movie_id)
+    # The DB is only needed for the detail fields of the movie itself
+    with timed('db_enrichment'):
+        movie = get_object_or_404(Movie, tmdb_id=movie_id)
     
-    # Get recommendations (returns list of dicts: {'title': '...', 'movie_id': ...})
-    recommendations_data = get_recommendations(movie.title)
+    # Recommendations come straight from the artifact metadata store
+    # (MovieRecord rows exposing movie_id, title, year, vote_average, ...)
+    # Ranking weights can be tuned per request, e.g. ?quality=1&recency=0.5
+    recommendations = get_recommendations(movie.title, movie_id=movie.tmdb_id, weights=parse_weights(request.GET))
+
+    return render(request, 'core/detail.html', {
+        'movie': movie,
+        'recommendations': recommendations
+    })
+
+@instrument_view('search')
+def search(request):
+    query = request.GET.get('q', '')
+    filter_type = request.GET.get('type', 'title') # 'title', 'language', 'genre'
     
-    # We need to fetch the actual Movie objects for these recommendations to get their stats/info (like release_date, votes)
-    # The template expects 'rec.movie_id', but the Movie model has 'tmdb_id'. 
-    # We will pass the Movie objects, but we need to ensure the template can access the ID.
-    # Movie object has .tmdb_id. The template provided uses .movie_id.
-    # We can annotate or just fix the template. I fixed the template to handle this, 
-    # BUT for consistency with the user's template using 'rec.movie_id', 
-    # let's construct a list of dicts or objects that have 'movie_id'.
+    movies = []
     
-    recommended_movies = []
-    for item in recommendations_data:
-        # Try to find in DB to get rich data
-        rec_obj = Movie.objects.filter(tmdb_id=item['movie_id']).first() 
-        if not rec_obj:
-             # Fallback: try title match
-             rec_obj = Movie.objects.filter(title=item['title']).first()
-        
-        if rec_obj:
-            # We wrap it or add an attribute to satisfy the template's 'rec.movie_id'
-            # Or simpler: The template uses {{ rec.movie_id }}. 
-            # Movie model has tmdb_id. Let's make sure we pass something that works.
-            # I will pass the Movie object, but I'll patch it dynamically or rely on the template change I made?
-            # Actually, in my template update above, for recommendations I used {{ rec.movie_id }}.
-            # Since I am passing Movie objects, they don't have .movie_id, they have .tmdb_id.
-            # I should alias it for the template, OR update the template to use tmdb_id.
-            # I updated the template above to use rec.movie_id because that's what the data from utils.py had.
-            # BUT if I replace that data with Movie objects, I break the template.
-            # FIX: I will pass a list of enriched properties.
-            rec_dict = {
-                'movie_id': rec_obj.tmdb_id,
-                'title': rec_obj.title,
-                'release_date': rec_obj.release_date,
-                'vote_average': rec_obj.vote_average,
-                'overview': rec_obj.overview,
-                'popularity': rec_obj.popularity,
-            }
-            recommended_movies.append(rec_dict)
-        else:
-            # If not in DB, pass the raw item from utils (basic info only)
-            recommended_movies.append(item)
+    if query:
+        # Results are rendered from the artifact metadata, in ranked order,
+        # without a DB round-trip
+        movies = search_movies(query, filter_type)
+
+    return render(request, 'core/index.html', {
+        'movies': movies, 
+        'search_query': query,
+        'filter_type': filter_type
+    })
+
+def parse_movie_ids(request):
+    """TMDB ids from ?ids=10,20 (or ?ids=10&ids=20); anything not a number is ignored."""
+    ids = []
+    for value in request.GET.getlist('ids'):
+        ids.extend(int(part) for part in value.split(',') if part.strip().isdecimal())
+    return ids
+
+@instrument_view('similar')
+def similar(request):
+    # "More like these": movies closest to all the given ones together,
+    # scored against the whole catalogue (needs a build with embeddings)
+    sources, movies = more_like_these(parse_movie_ids(request))
+    return render(request, 'core/index.html', {
+        'movies': movies,
+        'similar_to': ', '.join(movie.title for movie in sources),
+    })
+
+# Async versions of the views, served under ASGI (settings.ASYNC_VIEWS, see
+# urls.py); WSGI workers keep the sync ones, which need no event loop.
+# Artifact lookups are in-memory numpy work, but the first one in a worker (and
+# the first after a new build is published) loads the bundle from disk, so
+# they run on the default thread pool and the event loop keeps serving
+# meanwhile. The bundle is immutable, so any thread will do.
+recommend = sync_to_async(get_recommendations, thread_sensitive=False)
+recommend_by_id = sync_to_async(get_recommendations_by_id, thread_sensitive=False)
+search_artifacts = sync_to_async(search_movies, thread_sensitive=False)
+similar_artifacts = sync_to_async(more_like_these, thread_sensitive=False)
+
+@instrument_view('index')
+async def aindex(request):
+    # Show top 24 popular movies (grid of 4x6)
+    with timed('db_enrichment'):
+        movies = [movie async for movie in Movie.objects.order_by('-popularity')[:24]]
+    return render(request, 'core/index.html', {'movies': movies})
+
+@instrument_view('movie_detail')
+async def amovie_detail(request, movie_id):
+    # Ranking weights can be tuned per request, e.g. ?quality=1&recency=0.5
+    weights = parse_weights(request.GET)
+
+    # Recommendations come straight from the artifact metadata store
+    # (MovieRecord rows exposing movie_id, title, year, vote_average, ...).
+    # They only need the id from the URL, so they are looked up while the DB
+    # fetches the detail fields of the movie itself.
+    lookup = asyncio.ensure_future(recommend_by_id(movie_id, weights))
+    try:
+        with timed('db_enrichment'):
+            movie = await aget_object_or_404(Movie, tmdb_id=movie_id)
+    except BaseException:
+        lookup.cancel()
+        raise
+    recommendations = await lookup
+    if recommendations is None:
+        # Not in the build under this id; try the title
+        recommendations = await recommend(movie.title, weights=weights)
 
     return render(request, 'core/detail.html', {
         'movie': movie,
-        'recommendations': recommended_movies
+        'recommendations': recommendations
     })
 
-def search(request):
+@instrument_view('search')
+async def asearch(request):
     query = request.GET.get('q', '')
     filter_type = request.GET.get('type', 'title') # 'title', 'language', 'genre'
     
     movies = []
     
     if query:
-        # Use our updated utils function to find matching IDs
-        from .utils import search_movies
-        matching_ids = search_movies(query, filter_type)
-        
-        if matching_ids:
-            # Fetch objects from DB preserving order
-            # Django's 'in' lookup doesn't preserve order, so we fetch and sort in python
-            fetched_movies = Movie.objects.filter(tmdb_id__in=matching_ids)
-            movie_map = {m.tmdb_id: m for m in fetched_movies}
-            
-            for mid in matching_ids:
-                if mid in movie_map:
-                    movies.append(movie_map[mid])
-        
-        # If searching by title and we have a "best match", we could append recommendations too
-        # But for specific filters like "Language", we should probably just show the results.
-        if filter_type == 'title' and movies:
-             # Logic to add recommendations for the first result could go here similar to before
-             pass
+        # Results are rendered from the artifact metadata, in ranked order,
+        # without a DB round-trip
+        movies = await search_artifacts(query, filter_type)
 
     return render(request, 'core/index.html', {
         'movies': movies, 
         'search_query': query,
         'filter_type': filter_type
     })
+
+@instrument_view('similar')
+async def asimilar(request):
+    sources, movies = await similar_artifacts(parse_movie_ids(request))
+    return render(request, 'core/index.html', {
+        'movies': movies,
+        'similar_to': ', '.join(movie.title for movie in sources),
+    })
+
+def metrics(request):
+    # Scrapers only (token, else local address); looks like any other missing page from outside
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed:
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
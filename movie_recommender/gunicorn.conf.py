@@ -0,0 +1,9 @@
+# Read by gunicorn when started from this folder (see Procfile)
+
+
+def post_worker_init(worker):
+    # A worker resets SIGHUP to its default action (exit) when it starts. With
+    # --preload, wsgi.py ran in the master before that, so install the
+    # artifact reload handler again here; without --preload it is a no-op repeat.
+    from core.artifacts import install_reload_signal
+    install_reload_signal()
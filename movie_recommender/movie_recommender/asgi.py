@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie_recommender.settings')
+# Route to the async views (core/urls.py), e.g. under
+# `uvicorn movie_recommender.asgi:application`
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Let `kill -HUP <worker pid>` swap in a newly published artifact build
+from core.artifacts import install_reload_signal  # noqa: E402
+install_reload_signal()
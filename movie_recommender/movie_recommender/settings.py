@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -129,3 +130,40 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REPLACE THIS WITH YOUR ACTUAL API KEY
 TMDB_API_KEY = '9a244d5fd5773d30f037be792424d35f'
 
+# Recommendation artifacts (movie_meta.npz, similarity.npy, ...)
+# Unset means the repository root, then its artifacts/ folder.
+ARTIFACTS_DIR = os.environ.get('ARTIFACTS_DIR') or None
+
+# Seconds between checks for a new artifact build (None: never, reload on SIGHUP only)
+ARTIFACTS_RELOAD_INTERVAL = 5
+
+# Serve the async views (core/views.py); asgi.py sets ASYNC_VIEWS=1, WSGI
+# workers keep the sync views
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# Clients allowed to read /metrics/ (Prometheus text format, per worker process).
+# This is REMOTE_ADDR, which behind a reverse proxy on the same host is
+# 127.0.0.1 for every visitor: set METRICS_TOKEN there, and scrape with
+# `Authorization: Bearer <token>` (the IP list is then ignored).
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Artifact loads and recommendation/search errors are logged by core.*
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'core': {'handlers': ['console'], 'level': 'INFO'}},
+}
+
+# Default re-ranking and diversity of recommendations (see core/ranking.py); each can be
+# overridden per request on the detail page, e.g. /movie/603/?quality=1
+RECOMMENDATION_WEIGHTS = {
+    'similarity': 1.0,        # cosine score of the content match
+    'quality': 0.5,           # IMDB-style weighted rating, 0..1
+    'recency': 0.0,           # 2 ** (-age / half_life), 0..1
+    'half_life': 15.0,        # years
+    'diversity': 0.0,         # MMR trade-off, 0 (off) .. 1
+    'max_per_director': 0,    # 0: no cap
+    'max_per_collection': 2,  # at most two films of one franchise
+}
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie_recommender.settings')
 
 application = get_wsgi_application()
+
+# Let `kill -HUP <worker pid>` swap in a newly published artifact build
+from core.artifacts import install_reload_signal  # noqa: E402
+install_reload_signal()
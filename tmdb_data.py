@@ -0,0 +1,140 @@
+"""
+Loading of the Kaggle "The Movies Dataset" CSVs (movies_metadata.csv,
+credits.csv, keywords.csv), shared by generate_models.py and
+`manage.py import_45k`. Only needs pandas and numpy.
+
+Only the columns the callers use are parsed, all as plain strings (no
+type inference over mixed columns), ids are coerced and bad rows dropped
+before credits and keywords are filtered down to the surviving ids and
+merged. The crew column, the biggest in the dataset, is cut down to the
+director's entry while credits.csv is read in chunks. With a cache_dir
+each pruned CSV is converted once to a binary file (Parquet if pyarrow is
+installed, else a pickle) reused while the CSV is unchanged.
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+
+import numpy as np
+import pandas as pd
+
+MOVIE_COLUMNS = [
+    'id', 'title', 'overview', 'genres', 'popularity', 'release_date', 'vote_average', 'vote_count',
+    'poster_path', 'original_language', 'belongs_to_collection',
+]
+NUMERIC_COLUMNS = ['popularity', 'vote_average', 'vote_count']
+CSV_ENGINES = ['c', 'pyarrow']
+CHUNK_ROWS = 5000
+# Bump when the parsing below changes, so older cache files are ignored
+LOADER_VERSION = 1
+
+# One crew member dict; these hold no nested braces
+DIRECTOR_RE = re.compile(r"\{[^{}]*'job': 'Director'[^{}]*\}")
+
+
+def director_only(crew):
+    """A crew literal reduced to its first Director entry (what the builder uses)."""
+    if not isinstance(crew, str):
+        return crew
+    match = DIRECTOR_RE.search(crew)
+    return f'[{match.group(0)}]' if match else '[]'
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_csv(path, columns, engine='c', cache_dir=None, converters=None):
+    """
+    The given columns of a CSV, as strings (missing values stay NaN).
+    converters maps a column to a function applied to each value; with the
+    C engine the file is then read in chunks, so only the converted values
+    of the whole file are held in memory.
+    """
+    converters = converters or {}
+
+    def convert(df):
+        for column, fn in converters.items():
+            df[column] = df[column].map(fn)
+        return df
+
+    def read():
+        kwargs = {'usecols': columns, 'dtype': {column: object for column in columns}, 'engine': engine or 'c'}
+        if not converters or engine == 'pyarrow': # pyarrow can't read in chunks
+            return convert(pd.read_csv(path, **kwargs))
+        return pd.concat([convert(chunk) for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS, **kwargs)],
+                         ignore_index=True)
+
+    if not cache_dir:
+        return read()
+
+    st = os.stat(path)
+    key = hashlib.sha256(json.dumps(
+        [LOADER_VERSION, os.path.abspath(path), st.st_size, st.st_mtime_ns, sorted(columns),
+         sorted((column, fn.__name__) for column, fn in converters.items())]
+    ).encode('utf-8')).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    parquet = has_pyarrow()
+    cached = os.path.join(cache_dir, f"{stem}-{key}.{'parquet' if parquet else 'pkl'}")
+    if os.path.exists(cached):
+        if parquet:
+            return pd.read_parquet(cached)
+        with open(cached, 'rb') as f:
+            return pickle.load(f)
+
+    df = read()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = cached + '.tmp'
+    if parquet:
+        df.to_parquet(tmp)
+    else:
+        with open(tmp, 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cached)
+    return df
+
+
+def coerce_ids(df):
+    """Rows whose id is an integer (the real file has a few shifted rows), with int64 ids."""
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    df = df[ids.notna()].copy()
+    df['id'] = ids[ids.notna()].astype(np.int64)
+    return df
+
+
+def read_movies(data_dir, columns=MOVIE_COLUMNS, engine='c', cache_dir=None):
+    """
+    Valid rows of movies_metadata.csv: integer id and a release date.
+    Numeric columns are floats, NaN where unparseable.
+    """
+    movies = read_csv(os.path.join(data_dir, 'movies_metadata.csv'), columns, engine, cache_dir)
+    movies = coerce_ids(movies[movies['release_date'].notna()])
+    for column in NUMERIC_COLUMNS:
+        if column in movies:
+            movies[column] = pd.to_numeric(movies[column], errors='coerce')
+    return movies.reset_index(drop=True)
+
+
+def read_related(data_dir, name, columns, ids, engine='c', cache_dir=None, converters=None):
+    """Rows of credits.csv / keywords.csv for the given movie ids, one per id."""
+    df = coerce_ids(read_csv(os.path.join(data_dir, name), ['id'] + columns, engine, cache_dir, converters))
+    df = df[df['id'].isin(ids)]
+    # The real files repeat a few ids; duplicates would multiply rows in the merge
+    return df.drop_duplicates('id')
+
+
+def load_catalog(data_dir, engine='c', cache_dir=None):
+    """movies_metadata.csv merged with the cast, director (crew) and keywords of each movie."""
+    movies = read_movies(data_dir, engine=engine, cache_dir=cache_dir)
+    ids = movies['id'].unique()
+    credits = read_related(data_dir, 'credits.csv', ['cast', 'crew'], ids, engine, cache_dir,
+                           converters={'crew': director_only})
+    keywords = read_related(data_dir, 'keywords.csv', ['keywords'], ids, engine, cache_dir)
+    movies = movies.merge(credits, on='id')
+    return movies.merge(keywords, on='id')
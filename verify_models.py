@@ -1,4 +1,5 @@
 import pickle
+import numpy as np
 import pandas as pd
 import os
 import sys
@@ -6,7 +7,9 @@ import sys
 def verify():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     movies_path = os.path.join(base_dir, 'movies.pkl')
-    sim_path = os.path.join(base_dir, 'similarity.pkl')
+    sim_path = os.path.join(base_dir, 'similarity.npy')
+    if not os.path.exists(sim_path):
+        sim_path = os.path.join(base_dir, 'similarity.pkl') # Older builds
 
     if not os.path.exists(movies_path) or not os.path.exists(sim_path):
         print("Models not found!")
@@ -14,7 +17,10 @@ def verify():
 
     print("Loading models...")
     movies = pickle.load(open(movies_path, 'rb'))
-    similarity = pickle.load(open(sim_path, 'rb'))
+    if sim_path.endswith('.npy'):
+        similarity = np.load(sim_path)
+    else:
+        similarity = pickle.load(open(sim_path, 'rb'))
     print("Models loaded.")
 
     def get_recs(title):